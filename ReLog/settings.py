@@ -57,6 +57,12 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER')
 ADMIN_EMAIL = os.getenv('ADMIN_EMAIL')
 
+# Views queue mail in reapp.OutboundEmail; `manage.py send_outbox_emails` sends it
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_BACKOFF_SECONDS = 60  # doubled after every failed attempt
+EMAIL_OUTBOX_LEASE_SECONDS = 5 * 60
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -67,10 +73,13 @@ INSTALLED_APPS = [
     'reapp',
     'rest_framework',
     'corsheaders',
-    'rest_framework_simplejwt'
+    'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
 ]
 
 MIDDLEWARE = [
+    'reapp.middleware.RequestTimingMiddleware',
+    'reapp.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,6 +91,28 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
 ]
 
+# Requests slower than this are logged as warnings together with their SQL.
+# None disables SQL capture.
+SLOW_REQUEST_THRESHOLD_MS = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # Slow requests only; DEBUG adds a line for every request
+        'reapp.timing': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_TIMING_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 ROOT_URLCONF = 'ReLog.urls'
 
 TEMPLATES = [
@@ -105,8 +136,37 @@ WSGI_APPLICATION = 'ReLog.wsgi.application'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'reapp.authentication.CachedJWTAuthentication',
+    ],
+    # orjson-backed drop-ins for DRF's JSONRenderer/JSONParser; they fall back
+    # to them when orjson is not installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'reapp.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'reapp.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
+    # Reverse proxies in front of the app that append to X-Forwarded-For.
+    # Throttles identify clients by REMOTE_ADDR when it is 0, as any
+    # X-Forwarded-For a client sends itself would let it pick its address.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
+    # Used by reapp.throttling on the login, register, contact and password
+    # reset views. `<scope>_username` limits attempts per account: failed
+    # logins per account and address, password reset mails per address.
+    # `login_username_global` caps failed logins per account across all
+    # addresses.
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '20/min',
+        'login_username': '5/min',
+        'login_username_global': '100/hour',
+        'register': '10/hour',
+        'contact': '10/hour',
+        'password_reset': '10/hour',
+        'password_reset_username': '3/hour',
+    },
 }
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -123,6 +183,88 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth-users',
+    },
+    'compression': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'compressed-responses',
+        'OPTIONS': {'MAX_ENTRIES': 200},
+    },
+}
+
+# Rendered article/course JSON. Use a shared backend (file, database, redis)
+# when running several workers so evictions reach every process.
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+# Response compression (reapp.middleware.CompressionMiddleware) for the read
+# endpoints. 'br' is used only when the brotli package is installed. Bodies
+# under COMPRESSION_MIN_SIZE bytes are sent as they are; compressed bodies are
+# cached per process by content hash, and those of at least
+# COMPRESSION_STREAM_MIN_SIZE bytes are streamed out while the cache is filled.
+COMPRESSED_PATHS = ['/api/articles/', '/api/course/']
+COMPRESSION_ENCODINGS = ['br', 'gzip']
+COMPRESSION_LEVELS = {'br': 5, 'gzip': 6}
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_STREAM_MIN_SIZE = 256 * 1024
+COMPRESSION_CACHE_ALIAS = 'compression'
+COMPRESSION_CACHE_TIMEOUT = RESPONSE_CACHE_TIMEOUT
+
+# GET /api/changes/ page sizes. Entries younger than
+# CHANGE_FEED_SETTLE_SECONDS are held back so transactions that commit out of
+# order cannot slip behind a client's cursor; keep it above the longest write
+# transaction on articles and courses.
+CHANGE_FEED_PAGE_SIZE = 100
+CHANGE_FEED_MAX_PAGE_SIZE = 1000
+CHANGE_FEED_SETTLE_SECONDS = 2
+
+# manage.py export_static: where the static copy of the articles and courses
+# goes, and the host its image URLs point at (it must be in ALLOWED_HOSTS)
+STATIC_EXPORT_ROOT = BASE_DIR / 'static-export'
+STATIC_EXPORT_BASE_URL = os.getenv('STATIC_EXPORT_BASE_URL', 'http://localhost')
+STATIC_EXPORT_PAGE_SIZE = 100
+
+# Browser/CDN max-age of /api/course/catalog/; clients revalidate with its ETag
+CATALOG_MAX_AGE = 5 * 60
+
+# Users resolved from JWTs are cached per process. Saving or deleting a user
+# evicts it locally; other workers pick the change up within the timeout.
+AUTH_USER_CACHE_ALIAS = 'auth'
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# Throttle counters must live in a shared backend for the limits to hold
+# across workers
+THROTTLE_CACHE_ALIAS = 'default'
+
+# Concurrent password hash checks per worker; further logins wait up to
+# PASSWORD_HASH_WAIT_SECONDS and are then answered with 429
+PASSWORD_HASH_CONCURRENCY = 2
+PASSWORD_HASH_WAIT_SECONDS = 5
+
+# jtis of blacklisted refresh tokens, so replays are rejected without a
+# query. Run `manage.py flushexpiredtokens` periodically to prune the
+# outstanding/blacklisted token tables.
+TOKEN_REVOCATION_CACHE_ALIAS = 'default'
+
+# Where anonymous carts live: 'cookie' (signed cookie), 'cache' (signed cart
+# id in a cookie, contents in GUEST_CART_CACHE_ALIAS) or 'session' (CartItem
+# rows keyed by a DB session, the original behaviour). Cookie and cache carts
+# are written to CartItem when the visitor logs in.
+GUEST_CART_STORAGE = os.getenv('GUEST_CART_STORAGE', 'cookie')
+GUEST_CART_CACHE_ALIAS = 'default'
+GUEST_CART_MAX_AGE = 30 * 24 * 60 * 60
+GUEST_CART_MAX_ITEMS = 50
+# Largest quantity of one course in a cart; batch adds beyond it are rejected
+CART_MAX_QUANTITY = 1000
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -164,6 +306,15 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Course.image derivatives (reapp.images), exposed as `srcset` on courses.
+# With IMAGE_VARIANTS_ASYNC they are built after the response on a small
+# thread pool; `manage.py generate_course_images` backfills missing ones.
+IMAGE_VARIANT_WIDTHS = (320, 640, 1024)
+IMAGE_VARIANT_FORMATS = ('webp', 'jpeg')
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANTS_ASYNC = True
+IMAGE_VARIANTS_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
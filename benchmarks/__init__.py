@@ -0,0 +1,23 @@
+import os
+import sys
+from pathlib import Path
+
+import django
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    # Benchmarks run against a throwaway SQLite database unless DB_* is set
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ReLog.settings')
+    os.environ.setdefault('DB_ENGINE', 'django.db.backends.sqlite3')
+    os.environ.setdefault('DB_NAME', str(BASE_DIR / 'benchmark.sqlite3'))
+    os.environ.setdefault('SECRET_KEY', 'benchmark-only-secret-key-not-for-production')
+    django.setup()
+
+
+def create_test_database():
+    from django.db import connection
+
+    return connection.creation.create_test_db(verbosity=0)
@@ -0,0 +1,350 @@
+"""Throughput and latency of the main endpoints against a seeded SQLite database.
+
+    python -m benchmarks.http_load                       # in-process WSGI
+    python -m benchmarks.http_load --server gunicorn     # through a local gunicorn
+    python -m benchmarks.http_load --baseline benchmarks/baseline.json
+    python -m benchmarks.http_load --write-baseline benchmarks/baseline.json
+
+Every endpoint is driven by --concurrency client threads (login by at most
+PASSWORD_HASH_CONCURRENCY) for --requests requests after a warm-up, --rounds
+times over, and the median round is kept. A baseline is only written from a
+run without errors.
+
+Results are written as JSON; with --baseline the run fails (exit status 1)
+when an endpoint's throughput drops or its p95 latency grows by more than
+--tolerance (and, for p95, by more than --p95-slack-ms). The numbers are
+machine-specific: regenerate the baseline on the machine that runs the gate.
+"""
+import argparse
+import http.client
+import io
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks import BASE_DIR, setup_django
+
+HOST = 'localhost'
+
+
+def scenarios(token, users):
+    # name: (method, path, JSON body, headers, share of --requests); body and
+    # headers may also be functions of the request number
+    auth = {'Authorization': f'Bearer {token}'}
+    return {
+        # Password hashing makes login orders of magnitude slower than reads.
+        # Every login is another seed user from another address, as real
+        # traffic is, so the auth throttles never answer in place of the view.
+        'login': (
+            'POST', '/api/login/',
+            lambda n: {'username': f'seed-user-{n % users}', 'password': 'password'},
+            lambda n: {'X-Forwarded-For': f'10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}'},
+            0.05,
+        ),
+        'articles_list': ('GET', '/api/articles/', None, {}, 1),
+        'article_detail': ('GET', '/api/articles/seed-article-1/', None, {}, 1),
+        'courses_list': ('GET', '/api/course/', None, {}, 1),
+        'course_detail': ('GET', '/api/course/seed-course-1/', None, {}, 1),
+        'cart_list': ('GET', '/api/cart/', None, auth, 1),
+    }
+
+
+class WSGIClient:
+    # Calls ReLog.wsgi.application directly, without a socket
+    def __init__(self):
+        from ReLog.wsgi import application
+
+        self.application = application
+
+    def request(self, method, path, body, headers):
+        payload = json.dumps(body).encode() if body is not None else b''
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': HOST,
+            'SERVER_PORT': '80',
+            'HTTP_HOST': HOST,
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(payload)),
+            'wsgi.input': io.BytesIO(payload),
+            'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in headers.items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+        status = []
+        chunks = self.application(environ, lambda s, h, exc_info=None: status.append(s))
+        try:
+            b''.join(chunks)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        return int(status[0].split()[0])
+
+
+class HTTPClient:
+    def __init__(self, port):
+        self.port = port
+        self.local = threading.local()
+
+    def request(self, method, path, body, headers):
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Host': HOST, 'Content-Type': 'application/json', **headers}
+        # One keep-alive connection per client thread. gunicorn closes idle
+        # connections after a couple of seconds, so a reused connection that
+        # turns out to be closed is reopened once.
+        reused = hasattr(self.local, 'connection')
+        while True:
+            if not hasattr(self.local, 'connection'):
+                self.local.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+            try:
+                self.local.connection.request(method, path, payload, headers)
+                response = self.local.connection.getresponse()
+                response.read()
+                return response.status
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.local.connection.close()
+                del self.local.connection
+                if not reused:
+                    raise
+                reused = False
+            except (http.client.HTTPException, OSError):
+                self.local.connection.close()
+                del self.local.connection
+                raise
+
+
+def build_request(scenario, counter):
+    method, path, body, headers, _ = scenario
+    n = next(counter)
+    return method, path, body(n) if callable(body) else body, headers(n) if callable(headers) else headers
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_round(client, scenario, requests, concurrency, counter):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def worker(count):
+        nonlocal errors
+        for _ in range(count):
+            request = build_request(scenario, counter)
+            start = time.perf_counter()
+            try:
+                ok = 200 <= client.request(*request) < 300
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                errors += not ok
+
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, shares))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def run_scenario(client, scenario, requests, concurrency, warmup, rounds):
+    share = scenario[-1]
+    requests = max(concurrency, int(requests * share))
+    counter = itertools.count()
+    for _ in range(max(1, int(warmup * share))):
+        client.request(*build_request(scenario, counter))
+    # Single runs on a shared machine easily vary by 2x; the median round
+    # is what gets reported and compared
+    results = sorted(
+        (run_round(client, scenario, requests, concurrency, counter) for _ in range(rounds)),
+        key=lambda result: result['throughput_rps'],
+    )
+    median = results[len(results) // 2]
+    return {
+        'requests': requests,
+        'rounds': rounds,
+        'errors': sum(result['errors'] for result in results),
+        'throughput_rps': median['throughput_rps'],
+        'p50_ms': median['p50_ms'],
+        'p95_ms': median['p95_ms'],
+        'p99_ms': median['p99_ms'],
+    }
+
+
+def prepare_database(path, args):
+    from django.core.management import call_command
+
+    if path.exists() and not args.reseed:
+        # Existing databases still pick up migrations added since they were seeded
+        call_command('migrate', verbosity=0)
+        return
+    path.unlink(missing_ok=True)
+    call_command('migrate', verbosity=0)
+    call_command(
+        'seed_scale', users=args.users, articles=args.articles, courses=args.courses,
+        cart_items=args.cart_items, seed=1, verbosity=0,
+    )
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(workers, threads):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'ReLog.wsgi:application', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--threads', str(threads), '--log-level', 'warning', '--timeout', '120'],
+        cwd=BASE_DIR, env=os.environ.copy(),
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start listening within 30s')
+
+
+def compare(results, baseline, tolerance, p95_slack_ms):
+    regressions = []
+    for name, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            continue
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {current['throughput_rps']} < baseline {previous['throughput_rps']}")
+        # A few milliseconds of p95 are scheduler noise on a shared machine, whatever the percentage
+        if current['p95_ms'] > max(previous['p95_ms'] * (1 + tolerance), previous['p95_ms'] + p95_slack_ms):
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms > baseline {previous['p95_ms']}ms")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{name}: {current['errors']} errors, baseline had {previous['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=['wsgi', 'gunicorn'], default='wsgi')
+    parser.add_argument('--endpoints', nargs='*', help='Subset of scenarios to run (default: all)')
+    parser.add_argument('--requests', type=int, default=500, help='Measured requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=3, help='Measured rounds per endpoint; the median is kept')
+    parser.add_argument('--gunicorn-workers', type=int, default=2)
+    parser.add_argument('--gunicorn-threads', type=int, default=4)
+    parser.add_argument('--db', type=Path, default=Path(tempfile.gettempdir()) / 'relog-benchmark.sqlite3')
+    parser.add_argument('--reseed', action='store_true', help='Rebuild the database even if it exists')
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--articles', type=int, default=5000)
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--cart-items', type=int, default=10000)
+    parser.add_argument('--output', type=Path, default=Path('benchmark-results.json'))
+    parser.add_argument('--baseline', type=Path, help='Fail when results regress against this file')
+    parser.add_argument('--write-baseline', type=Path, help='Store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative regression (0.25 = 25%%)')
+    parser.add_argument('--p95-slack-ms', type=float, default=20,
+                        help='p95 growth below this many milliseconds is never a regression')
+    args = parser.parse_args()
+
+    os.environ['DB_ENGINE'] = 'django.db.backends.sqlite3'
+    os.environ['DB_NAME'] = str(args.db)
+    # Logins are slow by design; their slow-request warnings would flood the output
+    os.environ.setdefault('REQUEST_TIMING_LOG_LEVEL', 'ERROR')
+    # Clients are told apart by X-Forwarded-For, as behind one reverse proxy
+    os.environ['NUM_PROXIES'] = '1'
+    setup_django()
+    prepare_database(args.db, args)
+
+    from django.conf import settings
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from reapp.models import RegisterBlog
+
+    token = str(RefreshToken.for_user(RegisterBlog.objects.get(name='seed-user-1')).access_token)
+    selected = {
+        name: scenario for name, scenario in scenarios(token, args.users).items()
+        if not args.endpoints or name in args.endpoints
+    }
+
+    process = None
+    if args.server == 'gunicorn':
+        process, port = start_gunicorn(args.gunicorn_workers, args.gunicorn_threads)
+        client = HTTPClient(port)
+    else:
+        client = WSGIClient()
+
+    try:
+        results = {
+            'server': args.server,
+            'concurrency': args.concurrency,
+            'endpoints': {},
+        }
+        for name, scenario in selected.items():
+            # More logins at once than there are hash slots only measure the
+            # queue in front of them, and past PASSWORD_HASH_WAIT_SECONDS the
+            # deliberate 429s
+            concurrency = args.concurrency
+            if name == 'login':
+                concurrency = min(concurrency, settings.PASSWORD_HASH_CONCURRENCY)
+            results['endpoints'][name] = run_scenario(
+                client, scenario, args.requests, concurrency, args.warmup, args.rounds
+            )
+            results['endpoints'][name]['concurrency'] = concurrency
+            stats = results['endpoints'][name]
+            print(f"{name:<16} {stats['throughput_rps']:>9.1f} req/s  p50 {stats['p50_ms']:>8.2f}ms  "
+                  f"p95 {stats['p95_ms']:>8.2f}ms  p99 {stats['p99_ms']:>8.2f}ms  errors {stats['errors']}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    args.output.write_text(json.dumps(results, indent=2) + '\n')
+    # Baseline files hold one section per server mode
+    if args.write_baseline:
+        failed = [name for name, stats in results['endpoints'].items() if stats['errors']]
+        if failed:
+            sys.exit(f"Not writing a baseline with errors in: {', '.join(failed)}")
+        baseline = json.loads(args.write_baseline.read_text()) if args.write_baseline.exists() else {}
+        baseline[args.server] = results
+        args.write_baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text()).get(args.server, {})
+        regressions = compare(results, baseline, args.tolerance, args.p95_slack_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
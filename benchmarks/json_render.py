@@ -0,0 +1,97 @@
+"""Encode and decode throughput of DRF's JSON renderer/parser against the orjson ones.
+
+    python -m benchmarks.json_render
+    python -m benchmarks.json_render --iterations 200 --rounds 7
+
+Payloads are built once with the real serializers from the seeded benchmark
+database: an article list page, the course list, the full course catalog
+and the largest cart. Each renderer and parser then runs --iterations times
+per round, --rounds times over, and the median round is reported in MB/s.
+"""
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks import setup_django
+from benchmarks.http_load import prepare_database
+
+
+def payloads():
+    from django.db.models import Count
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from reapp.models import BlogArticle, CartItem, Course, RegisterBlog
+    from reapp.pagination import ArticleCursorPagination
+    from reapp.serializers import (
+        BlogArticleListSerializer, CartItemSerializer, CourseCardSerializer, CourseSerializer,
+    )
+
+    context = {'request': Request(APIRequestFactory().get('/', HTTP_HOST='localhost'))}
+    articles = BlogArticle.objects.for_listing()[:ArticleCursorPagination.page_size]
+    courses = Course.objects.all()
+    user = RegisterBlog.objects.annotate(items=Count('cart_items')).order_by('-items').first()
+    cart = CartItem.objects.filter(user=user).select_related('course')
+    return {
+        'articles_page': {'results': BlogArticleListSerializer(articles, many=True, context=context).data},
+        'courses_list': CourseCardSerializer(courses, many=True, context=context).data,
+        'catalog': {
+            'version': 'x' * 20,
+            'courses': CourseSerializer(courses, many=True, context={**context, 'sparse_fieldsets': False}).data,
+        },
+        'cart_list': {'cart_items': CartItemSerializer(cart, many=True, context=context).data},
+    }
+
+
+def throughput(function, size, iterations, rounds):
+    # MB/s of the median round
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        timings.append(time.perf_counter() - start)
+    return size * iterations / statistics.median(timings) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=100, help='Renders per round and payload')
+    parser.add_argument('--rounds', type=int, default=5, help='Measured rounds; the median is kept')
+    parser.add_argument('--db', type=Path, default=Path(tempfile.gettempdir()) / 'relog-benchmark.sqlite3')
+    parser.add_argument('--reseed', action='store_true')
+    args = parser.parse_args()
+    args.users, args.articles, args.courses, args.cart_items = 5000, 5000, 200, 10000
+
+    os.environ['DB_ENGINE'] = 'django.db.backends.sqlite3'
+    os.environ['DB_NAME'] = str(args.db)
+    setup_django()
+    prepare_database(args.db, args)
+
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from reapp.parsers import ORJSONParser
+    from reapp.renderers import ORJSONRenderer
+
+    print(f"{'payload':<14}{'bytes':>10}{'render json':>14}{'orjson':>10}{'':>8}{'parse json':>14}{'orjson':>10}")
+    for name, data in payloads().items():
+        body = JSONRenderer().render(data)
+        if ORJSONRenderer().render(data) != body:
+            raise SystemExit(f'{name}: ORJSONRenderer output differs from JSONRenderer')
+        render = [
+            throughput(lambda: renderer.render(data), len(body), args.iterations, args.rounds)
+            for renderer in (JSONRenderer(), ORJSONRenderer())
+        ]
+        parse = [
+            throughput(lambda: parser.parse(io.BytesIO(body)), len(body), args.iterations, args.rounds)
+            for parser in (JSONParser(), ORJSONParser())
+        ]
+        print(f"{name:<14}{len(body):>10}{render[0]:>10.1f}MB/s{render[1]:>6.1f}MB/s{render[1] / render[0]:>7.1f}x"
+              f"{parse[0]:>10.1f}MB/s{parse[1]:>6.1f}MB/s{parse[1] / parse[0]:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
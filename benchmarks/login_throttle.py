@@ -0,0 +1,127 @@
+"""Legitimate login throughput while the login endpoint is under attack.
+
+    python -m benchmarks.login_throttle
+    python -m benchmarks.login_throttle --attackers 32 --duration 20
+
+Runs the same traffic twice in-process: once with throttling and the hash
+concurrency cap disabled, once with the settings in ReLog/settings.py.
+Attack threads send --attack-rate wrong passwords a second, half of them
+credential-stuffing many usernames from one address and half guessing one
+account from rotating addresses; user threads log in correctly, each time
+as a different user from a different address.
+"""
+import argparse
+import itertools
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks import setup_django
+from benchmarks.http_load import WSGIClient, percentile, prepare_database
+
+
+def run_phase(client, args):
+    stop = time.monotonic() + args.duration
+    counter = itertools.count()
+    lock = threading.Lock()
+    legit = {'ok': 0, 'rejected': 0, 'latencies': []}
+    attack = {'requests': 0, 'throttled': 0}
+
+    def user():
+        while time.monotonic() < stop:
+            n = next(counter)
+            body = {'username': f'seed-user-{n % args.users}', 'password': 'password'}
+            start = time.perf_counter()
+            status = client.request('POST', '/api/login/', body, {'X-Forwarded-For': f'172.16.{n // 250}.{n % 250}'})
+            elapsed = time.perf_counter() - start
+            with lock:
+                legit['ok' if status == 200 else 'rejected'] += 1
+                legit['latencies'].append(elapsed)
+
+    def attacker(index):
+        # Open loop: each attacker sends at a fixed pace however fast the
+        # server answers, like remote clients would
+        interval = args.attackers / args.attack_rate
+        next_at = time.monotonic()
+        while time.monotonic() < stop:
+            time.sleep(max(0, next_at - time.monotonic()))
+            next_at += interval
+            n = next(counter)
+            if index % 2:
+                body, address = {'username': f'seed-user-{n % args.users}', 'password': 'guess'}, '203.0.113.7'
+            else:
+                body, address = {'username': 'seed-user-0', 'password': f'guess-{n}'}, f'198.51.{n // 250 % 250}.{n % 250}'
+            status = client.request('POST', '/api/login/', body, {'X-Forwarded-For': address})
+            with lock:
+                attack['requests'] += 1
+                attack['throttled'] += status == 429
+
+    with ThreadPoolExecutor(args.clients + args.attackers) as pool:
+        futures = [pool.submit(user) for _ in range(args.clients)]
+        futures += [pool.submit(attacker, i) for i in range(args.attackers)]
+        for future in futures:
+            future.result()
+
+    latencies = sorted(legit['latencies']) or [0]
+    return {
+        'logins_per_second': round(legit['ok'] / args.duration, 2),
+        'logins_rejected': legit['rejected'],
+        'login_p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'login_p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'attack_requests_per_second': round(attack['requests'] / args.duration, 1),
+        'attack_throttled': attack['throttled'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=30, help='Seconds per phase')
+    parser.add_argument('--clients', type=int, default=2, help='Threads logging in with valid credentials')
+    parser.add_argument('--attackers', type=int, default=16)
+    parser.add_argument('--attack-rate', type=float, default=50, help='Attack requests per second, all attackers together')
+    parser.add_argument('--db', type=Path, default=Path(tempfile.gettempdir()) / 'relog-benchmark.sqlite3')
+    parser.add_argument('--reseed', action='store_true')
+    parser.add_argument('--users', type=int, default=5000)
+    args = parser.parse_args()
+    args.articles, args.courses, args.cart_items = 5000, 200, 10000
+
+    os.environ['DB_ENGINE'] = 'django.db.backends.sqlite3'
+    os.environ['DB_NAME'] = str(args.db)
+    # Every login is a slow request by design; don't warn about each one
+    os.environ.setdefault('REQUEST_TIMING_LOG_LEVEL', 'ERROR')
+    setup_django()
+    prepare_database(args.db, args)
+
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.test import override_settings
+    from reapp import throttling
+
+    client = WSGIClient()
+    # Every 400/429 would otherwise be logged as a warning (set after
+    # ReLog.wsgi has configured logging)
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    # Clients are told apart by X-Forwarded-For, as behind one reverse proxy
+    behind_proxy = {**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}
+    unprotected = override_settings(
+        REST_FRAMEWORK={**behind_proxy, 'DEFAULT_THROTTLE_RATES': {}},
+        PASSWORD_HASH_CONCURRENCY=args.clients + args.attackers,
+    )
+    protected = override_settings(REST_FRAMEWORK=behind_proxy)
+    for name, overrides in (('unprotected', unprotected), ('protected', protected)):
+        for cache in caches.all():
+            cache.clear()
+        throttling._hash_slots = None
+        with overrides:
+            stats = run_phase(client, args)
+        print(f"{name:<12} logins {stats['logins_per_second']:>6.2f}/s (rejected {stats['logins_rejected']})  "
+              f"p50 {stats['login_p50_ms']:>8.1f}ms  p95 {stats['login_p95_ms']:>8.1f}ms  "
+              f"attack {stats['attack_requests_per_second']:>7.1f} req/s, {stats['attack_throttled']} throttled")
+
+
+if __name__ == '__main__':
+    main()
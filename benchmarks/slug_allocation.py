@@ -0,0 +1,40 @@
+"""Queries per BlogArticle.save() as the number of same-titled articles grows.
+
+    python -m benchmarks.slug_allocation [--max 5000]
+"""
+import argparse
+import time
+
+from benchmarks import create_test_database, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max', type=int, default=5000, help='Largest number of existing collisions')
+    args = parser.parse_args()
+
+    setup_django()
+    create_test_database()
+
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from reapp.models import BlogArticle
+
+    print(f"{'existing':>10} {'queries':>8} {'ms':>8}")
+    checkpoints = [0] + [10 ** i for i in range(1, 7) if 10 ** i <= args.max]
+    for existing in checkpoints:
+        missing = existing - BlogArticle.objects.filter(title='Introduction').count()
+        BlogArticle.objects.bulk_create(
+            BlogArticle(title='Introduction', slug=f'introduction-{n}' if n else 'introduction', content='x')
+            for n in range(existing - missing, existing)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            article = BlogArticle.objects.create(title='Introduction', content='x')
+            elapsed = (time.perf_counter() - start) * 1000
+        article.delete()
+        print(f"{existing:>10} {len(queries):>8} {elapsed:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import RegisterBlog, Course
+from .models import RegisterBlog, Course, OutboundEmail
 
 
 class CustomUserAdmin(UserAdmin):
@@ -20,3 +20,11 @@ class CustomUserAdmin(UserAdmin):
 
 admin.site.register(RegisterBlog, CustomUserAdmin)
 admin.site.register(Course)
+
+
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+
+
+admin.site.register(OutboundEmail, OutboundEmailAdmin)
@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import BlogArticle, ChangeLogEntry, Course
+from .serializers import BlogArticleSerializer, CourseSerializer
+
+# object_type: (model, serializer of the feed's data)
+TYPES = {
+    ChangeLogEntry.ARTICLE: (BlogArticle, BlogArticleSerializer),
+    ChangeLogEntry.COURSE: (Course, CourseSerializer),
+}
+OBJECT_TYPES = {model: object_type for object_type, (model, _) in TYPES.items()}
+
+
+def record(instance, action):
+    ChangeLogEntry.objects.create(
+        object_type=OBJECT_TYPES[type(instance)], object_id=instance.pk, slug=instance.slug, action=action,
+    )
+
+
+def record_many(model, rows, action):
+    # (pk, slug) pairs written without save() (bulk_create, update()), which sends no signals
+    ChangeLogEntry.objects.bulk_create(
+        [ChangeLogEntry(object_type=OBJECT_TYPES[model], object_id=pk, slug=slug, action=action) for pk, slug in rows],
+        batch_size=1000,
+    )
+
+
+def latest(object_type):
+    # (sequence, changed_at) of the newest entry of one type, from the (object_type, id) index
+    return ChangeLogEntry.objects.filter(object_type=object_type).order_by('-id').values_list(
+        'id', 'changed_at'
+    ).first()
+
+
+def page(request, since, limit):
+    # Entries are numbered when they are inserted but may become visible in
+    # a different order when transactions overlap. Holding back the newest
+    # few seconds keeps a late commit from landing behind a cursor a client
+    # already moved past.
+    # The page also stops at the first unsettled id, even when later ids
+    # have settled, so the cursor never passes an entry still held back.
+    cutoff = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+    entries = []
+    for entry in ChangeLogEntry.objects.filter(id__gt=since).order_by('id')[:limit + 1]:
+        if entry.changed_at > cutoff:
+            break
+        entries.append(entry)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Only the newest entry of each object in the page matters to a client
+    newest = {}
+    for entry in entries:
+        newest[entry.object_type, entry.object_id] = entry
+
+    data = {}
+    context = {'request': request, 'sparse_fieldsets': False}
+    for object_type, (model, serializer_class) in TYPES.items():
+        ids = [
+            entry.object_id for entry in newest.values()
+            if entry.object_type == object_type and entry.action != ChangeLogEntry.DELETED
+        ]
+        objects = model.objects.in_bulk(ids) if ids else {}
+        rendered = serializer_class(list(objects.values()), many=True, context=context).data
+        data.update(((object_type, pk), item) for pk, item in zip(objects, rendered))
+
+    changes = []
+    for entry in sorted(newest.values(), key=lambda entry: entry.pk):
+        item = data.get((entry.object_type, entry.object_id))
+        changes.append({
+            'sequence': entry.pk,
+            'type': entry.object_type,
+            'id': entry.object_id,
+            'slug': entry.slug,
+            # A row deleted after this entry is reported gone now; its tombstone follows later
+            'action': entry.action if item is not None else ChangeLogEntry.DELETED,
+            'changed_at': entry.changed_at,
+            'data': item,
+        })
+    return {
+        'changes': changes,
+        'next': entries[-1].pk if entries else since,
+        'has_more': has_more,
+    }
@@ -0,0 +1,83 @@
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CHUNK_SIZE = 64 * 1024
+
+
+def get_cache():
+    return caches[settings.COMPRESSION_CACHE_ALIAS]
+
+
+def encodings():
+    # Server preference when the client accepts several equally
+    return [name for name in settings.COMPRESSION_ENCODINGS if name != 'br' or brotli is not None]
+
+
+def negotiate(accept_encoding):
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for coding in encodings():
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress_chunks(chunks, encoding):
+    level = settings.COMPRESSION_LEVELS[encoding]
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        compress, finish = compressor.process, compressor.finish
+    else:
+        # wbits=31 writes a gzip header with a zero mtime, so equal bodies compress to equal bytes
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        compress, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        compressed = compress(chunk)
+        if compressed:
+            yield compressed
+    yield finish()
+
+
+def _stream_and_store(body, encoding, key):
+    parts = []
+    for compressed in compress_chunks((body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)), encoding):
+        parts.append(compressed)
+        yield compressed
+    # Only reached when the client read the whole response
+    get_cache().set(key, b''.join(parts), settings.COMPRESSION_CACHE_TIMEOUT)
+
+
+def precompressed(body, encoding):
+    # The compressed body from the cache, compressing and storing it on a
+    # miss. Large bodies that miss come back as an iterator of compressed
+    # chunks instead, so sending starts before compression finishes.
+    cache = get_cache()
+    key = f'compressed:{encoding}:{hashlib.sha256(body).hexdigest()}'
+    compressed = cache.get(key)
+    if compressed is not None:
+        return compressed
+    if len(body) >= settings.COMPRESSION_STREAM_MIN_SIZE:
+        return _stream_and_store(body, encoding, key)
+    compressed = b''.join(compress_chunks([body], encoding))
+    cache.set(key, compressed, settings.COMPRESSION_CACHE_TIMEOUT)
+    return compressed
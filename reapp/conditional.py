@@ -0,0 +1,65 @@
+import hashlib
+
+from django.views.decorators.http import condition
+
+from . import changes, response_cache
+from .models import BlogArticle, ChangeLogEntry, Course
+
+
+def row_version(queryset):
+    row = queryset.values_list('pk', 'updated_at').first()
+    return None if row is None else (f'{row[0]}:{row[1].isoformat()}', row[1])
+
+
+def feed_version(object_type):
+    # The newest change feed entry moves with every create, update and
+    # delete, tombstones included, so it also gives lists a Last-Modified
+    entry = changes.latest(object_type)
+    return (str(entry[0]), entry[1]) if entry else ('0', None)
+
+
+def conditional(version):
+    # condition() for GET views whose version(request, *args, **kwargs)
+    # returns (token, last_modified) or None. The version is looked up once
+    # per request and cached like the responses, so a 304 needs neither the
+    # row nor its serialization.
+    def validators(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        if not hasattr(request, '_version'):
+            request._version = version(request, *args, **kwargs)
+        return request._version
+
+    def etag(request, *args, **kwargs):
+        current = validators(request, *args, **kwargs)
+        if current is None:
+            return None
+        # Host and query string change the body as well
+        seed = f'{current[0]}|{response_cache.variant(request)}'
+        return '"%s"' % hashlib.sha256(seed.encode()).hexdigest()[:32]
+
+    def last_modified(request, *args, **kwargs):
+        current = validators(request, *args, **kwargs)
+        return current[1] if current else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def article_version(request, slug):
+    return response_cache.detail_version(
+        response_cache.ARTICLES, slug, lambda: row_version(BlogArticle.objects.filter(slug=slug))
+    )
+
+
+def article_list_version(request):
+    return response_cache.list_version(response_cache.ARTICLES, lambda: feed_version(ChangeLogEntry.ARTICLE))
+
+
+def course_version(request, slug):
+    return response_cache.detail_version(
+        response_cache.COURSES, slug, lambda: row_version(Course.objects.filter(slug=slug))
+    )
+
+
+def course_list_version(request):
+    return response_cache.list_version(response_cache.COURSES, lambda: feed_version(ChangeLogEntry.COURSE))
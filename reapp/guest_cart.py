@@ -0,0 +1,112 @@
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import CartItem, Course
+from .serializers import CourseCardSerializer
+
+COOKIE_NAME = 'guest_cart'
+SALT = 'reapp.guest_cart'
+
+
+def storage():
+    return settings.GUEST_CART_STORAGE
+
+
+def uses_database():
+    # 'session' is the original behaviour: guest CartItem rows keyed by a DB session
+    return storage() == 'session'
+
+
+def _cookie(request):
+    try:
+        return request.get_signed_cookie(COOKIE_NAME, default=None, salt=SALT, max_age=settings.GUEST_CART_MAX_AGE)
+    except signing.BadSignature:
+        return None
+
+
+def _set_cookie(response, value):
+    response.set_signed_cookie(
+        COOKIE_NAME, value, salt=SALT, max_age=settings.GUEST_CART_MAX_AGE,
+        secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+    )
+
+
+def _cache_key(cart_id):
+    return f'guest-cart:{cart_id}'
+
+
+def load(request):
+    # {course_id: [quantity, added_at]} with added_at in epoch seconds
+    value = _cookie(request)
+    if value and storage() == 'cache':
+        value = caches[settings.GUEST_CART_CACHE_ALIAS].get(_cache_key(value))
+    try:
+        return {int(course_id): item for course_id, item in json.loads(value).items()} if value else {}
+    except (ValueError, AttributeError):
+        return {}
+
+
+def save(request, response, items):
+    value = json.dumps({str(course_id): item for course_id, item in items.items()}, separators=(',', ':'))
+    if storage() == 'cache':
+        cart_id = _cookie(request) or uuid.uuid4().hex
+        caches[settings.GUEST_CART_CACHE_ALIAS].set(_cache_key(cart_id), value, settings.GUEST_CART_MAX_AGE)
+        value = cart_id
+    _set_cookie(response, value)
+
+
+def clear(request, response):
+    if storage() == 'cache' and _cookie(request):
+        caches[settings.GUEST_CART_CACHE_ALIAS].delete(_cache_key(_cookie(request)))
+    response.delete_cookie(COOKIE_NAME, samesite='Lax')
+
+
+def add(items, course_id, quantity):
+    current, added_at = items.get(course_id, (0, int(time.time())))
+    items[course_id] = [min(current + quantity, settings.CART_MAX_QUANTITY), added_at]
+
+
+def item(course, quantity, added_at):
+    # Unsaved CartItem so guest carts serialize like stored ones; the course id doubles as the item id
+    return CartItem(
+        id=course.pk, course=course, quantity=quantity,
+        added_at=datetime.fromtimestamp(added_at, tz=timezone.utc),
+    )
+
+
+def build_items(items):
+    courses = Course.objects.only(*CourseCardSerializer().get_only_fields()).in_bulk(items) if items else {}
+    cart = [item(courses[course_id], *items[course_id]) for course_id in items if course_id in courses]
+    return sorted(cart, key=lambda cart_item: cart_item.added_at, reverse=True)
+
+
+def merge(request, response, user):
+    # Moves the guest cart into the user's cart at login, adding quantities
+    # for courses that are in both
+    if uses_database():
+        if not request.session.session_key:
+            return
+        rows = CartItem.objects.filter(session_key=request.session.session_key)
+        with transaction.atomic():
+            quantities = dict(rows.values_list('course_id', 'quantity'))
+            if quantities:
+                CartItem.objects.add_quantities(quantities, user=user)
+                rows.delete()
+        return
+
+    items = load(request)
+    if not items and not request.COOKIES.get(COOKIE_NAME):
+        return
+    # Courses deleted since they were added to the cookie are dropped
+    existing = set(Course.objects.filter(pk__in=items).values_list('pk', flat=True)) if items else set()
+    quantities = {course_id: quantity for course_id, (quantity, _) in items.items() if course_id in existing}
+    if quantities:
+        CartItem.objects.add_quantities(quantities, user=user)
+    clear(request, response)
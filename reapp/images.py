@@ -0,0 +1,130 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from . import response_cache
+
+logger = logging.getLogger('reapp.images')
+
+# Pillow format name and file extension for each derivative format
+FORMATS = {'webp': ('WEBP', 'webp'), 'jpeg': ('JPEG', 'jpg')}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def formats():
+    return [name for name in settings.IMAGE_VARIANT_FORMATS if name != 'webp' or features.check('webp')]
+
+
+def needs_variants(course):
+    return bool(course.image) and course.image_variants.get('source') != course.image.name
+
+
+def render(image, width, image_format):
+    height = round(image.height * width / image.width)
+    resized = image.resize((width, height), Image.Resampling.LANCZOS)
+    if image_format == 'JPEG' and resized.mode != 'RGB':
+        resized = resized.convert('RGB')
+    buffer = BytesIO()
+    resized.save(buffer, image_format, quality=settings.IMAGE_VARIANT_QUALITY)
+    return buffer.getvalue()
+
+
+def build_variants(field_file):
+    # Derivatives go next to the original as <name>-<width>w.<ext>; widths
+    # above the original's are skipped rather than upscaled
+    storage = field_file.storage
+    stem = os.path.splitext(field_file.name)[0]
+    with storage.open(field_file.name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    widths = [width for width in settings.IMAGE_VARIANT_WIDTHS if width < image.width] or [image.width]
+    variants = {}
+    for name in formats():
+        image_format, extension = FORMATS[name]
+        variants[name] = []
+        for width in widths:
+            content = ContentFile(render(image, width, image_format))
+            variants[name].append({'width': width, 'name': storage.save(f'{stem}-{width}w.{extension}', content)})
+    return variants
+
+
+def delete_variants(storage, image_variants):
+    for variants in image_variants.get('variants', {}).values():
+        for variant in variants:
+            storage.delete(variant['name'])
+
+
+def generate(course_id, force=False):
+    from . import changes
+    from .models import ChangeLogEntry, Course
+
+    course = Course.objects.filter(pk=course_id).only('slug', 'image', 'image_variants').first()
+    if course is None or not course.image or not (force or needs_variants(course)):
+        return False
+    source = course.image.name
+    try:
+        variants = build_variants(course.image)
+    except OSError:
+        # Missing or unreadable upload: recorded with no variants so it is not retried on every save
+        logger.warning('Could not build image variants for course %s from %s', course_id, source, exc_info=True)
+        variants = {}
+    # update() skips the save signals, and only applies if the image was not replaced meanwhile.
+    # The srcset is part of the representation, so updated_at moves with it.
+    updated = Course.objects.filter(pk=course_id, image=source).update(
+        image_variants={'source': source, 'variants': variants}, updated_at=timezone.now(),
+    )
+    if updated:
+        delete_variants(course.image.storage, course.image_variants)
+        changes.record_many(Course, [(course_id, course.slug)], ChangeLogEntry.UPDATED)
+        # update() bypasses the signals that evict cached course responses
+        response_cache.invalidate(response_cache.COURSES, course.slug)
+    else:
+        delete_variants(course.image.storage, {'variants': variants})
+    return bool(updated and variants)
+
+
+def _run(course_id):
+    close_old_connections()
+    try:
+        generate(course_id)
+    except Exception:
+        logger.exception('Image variant generation failed for course %s', course_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(course_id):
+    # Runs after the request on a small pool; anything lost with the process
+    # is picked up by `manage.py generate_course_images`
+    global _executor
+    if not settings.IMAGE_VARIANTS_ASYNC:
+        generate(course_id)
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(settings.IMAGE_VARIANTS_WORKERS, thread_name_prefix='course-images')
+    _executor.submit(_run, course_id)
+
+
+def srcset(course, request=None):
+    # {'webp': 'url 320w, url 640w', 'jpeg': ...}; empty until the variants exist
+    if not course.image or course.image_variants.get('source') != course.image.name:
+        return {}
+    storage = course.image.storage
+    result = {}
+    for name, variants in course.image_variants.get('variants', {}).items():
+        urls = [(storage.url(variant['name']), variant['width']) for variant in variants]
+        if request is not None:
+            urls = [(request.build_absolute_uri(url), width) for url, width in urls]
+        result[name] = ', '.join(f'{url} {width}w' for url, width in urls)
+    return result
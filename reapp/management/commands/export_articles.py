@@ -0,0 +1,33 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from reapp.models import BlogArticle
+
+
+class Command(BaseCommand):
+    help = 'Stream every BlogArticle as NDJSON (one {"slug", "title", "content"} object per line)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help='File to write to, "-" for stdout')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched from the database at a time')
+
+    def handle(self, *args, **options):
+        out = sys.stdout if options['output'] == '-' else open(options['output'], 'w', encoding='utf-8')
+        start = time.perf_counter()
+        count = 0
+        try:
+            rows = BlogArticle.objects.order_by('pk').values('slug', 'title', 'content')
+            for row in rows.iterator(chunk_size=options['chunk_size']):
+                out.write(json.dumps(row, ensure_ascii=False))
+                out.write('\n')
+                count += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        elapsed = time.perf_counter() - start
+        # Progress goes to stderr so stdout stays valid NDJSON
+        self.stderr.write(f"Exported {count} articles in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f}/s)")
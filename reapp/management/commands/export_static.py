@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from itertools import groupby, islice
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.exceptions import DisallowedHost
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from reapp.models import BlogArticle, ChangeLogEntry, Course
+from reapp.renderers import ORJSONRenderer
+from reapp.serializers import BlogArticleListSerializer, BlogArticleSerializer, CourseCardSerializer, CourseSerializer
+
+MANIFEST = 'manifest.json'
+# Bumped when the manifest layout changes; an older one means a full run
+MANIFEST_FORMAT = 2
+CHUNK_SIZE = 500
+
+# object_type: (directory, model, detail serializer, list serializer)
+SECTIONS = {
+    ChangeLogEntry.ARTICLE: ('articles', BlogArticle, BlogArticleSerializer, BlogArticleListSerializer),
+    ChangeLogEntry.COURSE: ('courses', Course, CourseSerializer, CourseCardSerializer),
+}
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def links(numbers):
+    # {page number: (newer page, older page)} for page numbers newest first
+    return {
+        number: (numbers[index - 1] if index else None, numbers[index + 1] if index + 1 < len(numbers) else None)
+        for index, number in enumerate(numbers)
+    }
+
+
+class Export:
+    # Writes go to a temporary file that replaces the target, so a server
+    # or sync job never sees a half-written file, and are skipped when the
+    # file already holds the same bytes
+    def __init__(self, root):
+        self.root = root
+        self.written = self.removed = 0
+
+    def read(self, path):
+        try:
+            return (self.root / path).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def write(self, path, content):
+        target = self.root / path
+        if self.read(path) != content:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=target.parent, prefix='.', delete=False) as f:
+                f.write(content)
+            os.replace(f.name, target)
+            self.written += 1
+        return {'path': path, 'sha256': hashlib.sha256(content).hexdigest()}
+
+    def remove(self, path):
+        if (self.root / path).exists():
+            (self.root / path).unlink()
+            self.removed += 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Render every BlogArticle and Course (detail JSON, list pages and manifest.json) to a directory that '
+        'can be served as static files. Later runs only re-render what the change feed reports and only '
+        'rewrite files whose content changed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.STATIC_EXPORT_ROOT, help='Directory to write to')
+        parser.add_argument('--base-url', default=settings.STATIC_EXPORT_BASE_URL,
+                            help='Scheme and host of the absolute image URLs, as the API would render them')
+        parser.add_argument('--page-size', type=int, default=settings.STATIC_EXPORT_PAGE_SIZE,
+                            help='Id range per list page; changing it re-renders everything')
+        parser.add_argument('--full', action='store_true', help='Re-render everything, not only changed objects')
+
+    def handle(self, *args, **options):
+        root = Path(options['output'])
+        manifest_path = root / MANIFEST
+        manifest = json.loads(manifest_path.read_bytes()) if manifest_path.exists() else {}
+        full = options['full'] or manifest.get('format') != MANIFEST_FORMAT or any(
+            manifest.get(key) != options[key] for key in ('page_size', 'base_url')
+        )
+
+        start = time.perf_counter()
+        self.page_size = options['page_size']
+        self.context = {'request': self.build_request(options['base_url']), 'sparse_fieldsets': False}
+        export = Export(root)
+        since = None if full else manifest.get('sequence')
+        sequence = self.settled_sequence(since or 0)
+
+        sections = {}
+        for object_type, section in SECTIONS.items():
+            previous = manifest.get('sections', {}).get(section[0])
+            if since is None or previous is None:
+                sections[section[0]] = self.export_all(export, section)
+                continue
+            changed = set(
+                ChangeLogEntry.objects.filter(id__gt=since, object_type=object_type).values_list('object_id', flat=True)
+            )
+            sections[section[0]] = self.export_changed(export, section, previous, changed) if changed else previous
+
+        if export.written or export.removed or manifest.get('sequence') != sequence:
+            export.write(MANIFEST, json.dumps({
+                'format': MANIFEST_FORMAT,
+                'sequence': sequence,
+                'base_url': options['base_url'],
+                'page_size': options['page_size'],
+                'sections': sections,
+            }, indent=1, sort_keys=True).encode())
+        self.stdout.write(
+            f"Wrote {export.written} files and removed {export.removed} in {time.perf_counter() - start:.2f}s "
+            f"(change feed sequence {sequence})"
+        )
+
+    def settled_sequence(self, since):
+        # As in reapp.changes.page, the cursor stops before the first entry
+        # still inside the settle window; later ones are rendered now and
+        # again on the next run
+        cutoff = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+        entries = ChangeLogEntry.objects.filter(id__gt=since).order_by('id').values_list('id', flat=True)
+        unsettled = entries.filter(changed_at__gt=cutoff).first()
+        if unsettled is not None:
+            return max(since, unsettled - 1)
+        return entries.last() or since
+
+    def build_request(self, base_url):
+        url = urlsplit(base_url)
+        request = Request(APIRequestFactory().get('/', HTTP_HOST=url.netloc, secure=url.scheme == 'https'))
+        try:
+            request.build_absolute_uri('/')
+        except DisallowedHost:
+            raise CommandError(f'{url.netloc} is not in ALLOWED_HOSTS; pass a --base-url the API is served from')
+        return request
+
+    def page_number(self, pk):
+        # Page n holds the ids from (n - 1) * page_size + 1 to n * page_size,
+        # so an edit or delete only touches its own page and a new object the
+        # newest one. Pages and their rows are newest first, as in the API.
+        return (pk - 1) // self.page_size + 1
+
+    def page_path(self, directory, number):
+        return f'{directory}/page-{number}.json'
+
+    def list_queryset(self, section):
+        _, model, _, list_serializer = section
+        if model is BlogArticle:
+            return BlogArticle.objects.for_listing()
+        return model.objects.only(*list_serializer(context=self.context).get_only_fields())
+
+    def render_details(self, export, section, objects):
+        directory, _, detail_serializer, _ = section
+        rendered = detail_serializer(objects, many=True, context=self.context).data
+        for obj, data in zip(objects, rendered):
+            export.write(f'{directory}/{obj.slug}.json', ORJSONRenderer().render(data))
+
+    def render_pages(self, export, section, rows, numbers):
+        # rows: {page number: objects} of every page to (re)write; numbers:
+        # all non-empty page numbers, newest first, for the links
+        directory, _, _, list_serializer = section
+        pages = {}
+        for number, (newer, older) in links(numbers).items():
+            if number not in rows:
+                continue
+            body = {
+                'previous': self.page_path(directory, newer) if newer else None,
+                'next': self.page_path(directory, older) if older else None,
+                'results': list_serializer(rows[number], many=True, context=self.context).data,
+            }
+            page = export.write(self.page_path(directory, number), ORJSONRenderer().render(body))
+            pages[number] = {**page, 'number': number, 'count': len(rows[number])}
+        return pages
+
+    def section_manifest(self, pages):
+        ordered = sorted(pages.values(), key=lambda page: -page['number'])
+        return {'count': sum(page['count'] for page in ordered), 'pages': ordered}
+
+    def export_all(self, export, section):
+        directory, model, _, _ = section
+        keep = set()
+        for objects in chunks(model.objects.order_by('pk').iterator(chunk_size=CHUNK_SIZE), CHUNK_SIZE):
+            self.render_details(export, section, objects)
+            keep.update(f'{directory}/{obj.slug}.json' for obj in objects)
+
+        listed = self.list_queryset(section).order_by('-pk').iterator(chunk_size=CHUNK_SIZE)
+        rows = {number: list(objects) for number, objects in groupby(listed, key=lambda obj: self.page_number(obj.pk))}
+        pages = self.render_pages(export, section, rows, list(rows))
+        keep.update(page['path'] for page in pages.values())
+
+        # Files of objects that are gone, whether or not an earlier manifest knew them
+        if (export.root / directory).exists():
+            for path in sorted((export.root / directory).glob('*.json')):
+                if f'{directory}/{path.name}' not in keep:
+                    export.remove(f'{directory}/{path.name}')
+        return self.section_manifest(pages)
+
+    def export_changed(self, export, section, previous, changed):
+        directory, model, _, _ = section
+        known = {page['number']: page for page in previous['pages']}
+        affected = {self.page_number(pk) for pk in changed}
+
+        # Slugs the affected pages listed before, to find the detail files of
+        # deleted and renamed objects
+        listed_before = set()
+        for number in affected & set(known):
+            content = export.read(self.page_path(directory, number))
+            if content is not None:
+                listed_before.update(item['slug'] for item in json.loads(content)['results'])
+
+        rendered = set()
+        for ids in chunks(sorted(changed), CHUNK_SIZE):
+            objects = list(model.objects.filter(pk__in=ids).order_by('pk'))
+            self.render_details(export, section, objects)
+            rendered.update(obj.slug for obj in objects)
+
+        rows = {number: self.page_rows(section, number) for number in affected}
+        numbers = sorted((set(known) - affected) | {number for number in affected if rows[number]}, reverse=True)
+        # Pages next to one that appeared or emptied get new links
+        before = links(sorted(known, reverse=True))
+        for number, neighbours in links(numbers).items():
+            if number not in rows and neighbours != before[number]:
+                rows[number] = self.page_rows(section, number)
+
+        pages = {number: page for number, page in known.items() if number in numbers}
+        pages.update(self.render_pages(export, section, rows, numbers))
+        for number in affected & set(known):
+            if number not in numbers:
+                export.remove(self.page_path(directory, number))
+        listed_now = {obj.slug for number in affected for obj in rows[number]}
+        for slug in listed_before - listed_now - rendered:
+            export.remove(f'{directory}/{slug}.json')
+        return self.section_manifest(pages)
+
+    def page_rows(self, section, number):
+        low, high = (number - 1) * self.page_size, number * self.page_size
+        return list(self.list_queryset(section).filter(pk__gt=low, pk__lte=high).order_by('-pk'))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reapp import images
+from reapp.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Build the resized Course.image variants that are missing or stale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild every course, not only stale ones')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        built = 0
+        courses = Course.objects.exclude(image='').only('image', 'image_variants').order_by('pk')
+        for course in courses.iterator(chunk_size=500):
+            if options['force'] or images.needs_variants(course):
+                built += images.generate(course.pk, force=options['force'])
+        self.stdout.write(f"Built image variants for {built} courses in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,107 @@
+import json
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.core.validators import slug_re
+from django.db import IntegrityError, transaction
+from django.utils.text import slugify
+from rest_framework import serializers
+
+from reapp import changes, response_cache
+from reapp.models import BlogArticle, ChangeLogEntry
+from reapp.serializers import BlogArticleSerializer
+
+
+class Command(BaseCommand):
+    help = 'Import BlogArticles from NDJSON produced by export_articles, in bulk chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input', default='-', help='File to read from, "-" for stdin')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Articles validated and inserted per transaction')
+
+    def handle(self, *args, **options):
+        source = sys.stdin if options['input'] == '-' else open(options['input'], encoding='utf-8')
+        start = time.perf_counter()
+        imported = rejected = 0
+        try:
+            lines = enumerate(source, start=1)
+            while chunk := list(islice(lines, options['chunk_size'])):
+                created, errors = self.import_chunk(chunk)
+                imported += created
+                rejected += len(errors)
+                for line_number, error in errors:
+                    self.stderr.write(f"line {line_number}: {error}")
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"{imported} imported ({imported / (time.perf_counter() - start):.0f}/s)")
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        # bulk_create bypasses the post_save signals that normally evict list pages
+        response_cache.invalidate(response_cache.ARTICLES)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Imported {imported} articles ({rejected} rejected) in {elapsed:.2f}s "
+            f"({imported / elapsed if elapsed else 0:.0f}/s)"
+        )
+
+    def import_chunk(self, chunk):
+        # One serializer instance validates the whole chunk, like many=True
+        # does, but lets valid rows through when others fail
+        validator = BlogArticleSerializer()
+        articles, requested, errors = [], [], []
+        for line_number, line in chunk:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                errors.append((line_number, f"invalid JSON: {e}"))
+                continue
+            if not isinstance(row, dict):
+                errors.append((line_number, "expected a JSON object"))
+                continue
+            # Slugs are assigned below for the whole chunk at once; keeping them
+            # out of validation avoids a uniqueness query per row
+            slug = row.pop('slug', None)
+            try:
+                data = validator.run_validation(row)
+            except serializers.ValidationError as e:
+                errors.append((line_number, e.detail))
+                continue
+            articles.append(BlogArticle(**data))
+            requested.append(slug if isinstance(slug, str) and slug_re.match(slug) else None)
+
+        for attempt in range(BlogArticle.SLUG_ATTEMPTS if articles else 0):
+            self.assign_slugs(articles, requested)
+            try:
+                with transaction.atomic():
+                    BlogArticle.objects.bulk_create(articles)
+                    # Not every backend returns the new ids from bulk_create
+                    created = BlogArticle.objects.filter(slug__in=[article.slug for article in articles])
+                    changes.record_many(BlogArticle, created.values_list('pk', 'slug'), ChangeLogEntry.CREATED)
+                break
+            except IntegrityError:
+                # Another writer took one of the slugs; allocate again
+                if attempt == BlogArticle.SLUG_ATTEMPTS - 1:
+                    raise
+        return len(articles), errors
+
+    def assign_slugs(self, articles, requested):
+        # Exported slugs are kept when still free so links survive a restore;
+        # everything else gets a fresh slug from its title
+        taken = set(BlogArticle.objects.filter(slug__in=[s for s in requested if s]).values_list('slug', flat=True))
+        kept, pending = set(), []
+        for article, slug in zip(articles, requested):
+            if slug and slug not in taken:
+                article.slug = slug
+                taken.add(slug)
+                kept.add(slug)
+            else:
+                pending.append(article)
+        bases = [slugify(article.title)[:240] for article in pending]
+        for article, slug in zip(pending, BlogArticle.objects.unique_slugs(bases, reserved=kept)):
+            article.slug = slug
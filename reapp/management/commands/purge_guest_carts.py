@@ -0,0 +1,44 @@
+import time
+from datetime import timedelta
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from reapp.models import CartItem
+
+
+def delete_in_chunks(queryset, chunk_size):
+    # Each DELETE only touches chunk_size rows picked by primary key, so no
+    # statement holds its locks for long
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        deleted += queryset.model.objects.filter(pk__in=pks).delete()[0]
+
+
+class Command(BaseCommand):
+    help = 'Delete guest cart items older than --days whose session has expired, then the expired sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Only remove cart items added this many days ago')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows deleted per statement')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        live_session = Session.objects.filter(session_key=OuterRef('session_key'), expire_date__gt=now)
+        abandoned = CartItem.objects.filter(
+            session_key__isnull=False,
+            added_at__lt=now - timedelta(days=options['days']),
+        ).filter(~Exists(live_session))
+
+        start = time.perf_counter()
+        items = delete_in_chunks(abandoned, options['chunk_size'])
+        self.stdout.write(f"Removed {items} guest cart items in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        sessions = delete_in_chunks(Session.objects.filter(expire_date__lte=now), options['chunk_size'])
+        self.stdout.write(f"Removed {sessions} expired sessions in {time.perf_counter() - start:.2f}s")
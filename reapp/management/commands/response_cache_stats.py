@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from reapp import response_cache
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the article and course response cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them')
+
+    def handle(self, *args, **options):
+        # The counters live in the cache; a per-process one would only show this command's own zeros
+        if isinstance(response_cache.get_cache(), (LocMemCache, DummyCache)):
+            raise CommandError(
+                f"RESPONSE_CACHE_ALIAS '{settings.RESPONSE_CACHE_ALIAS}' is not shared between processes, so the "
+                "server's counters cannot be read from here; point it at a file, database or redis cache"
+            )
+        counters = response_cache.stats()
+        total = counters['hits'] + counters['misses']
+        ratio = counters['hits'] / total if total else 0.0
+        self.stdout.write(f"hits={counters['hits']} misses={counters['misses']} hit_ratio={ratio:.2%}")
+        if options['reset']:
+            response_cache.reset_stats()
@@ -0,0 +1,181 @@
+import hashlib
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from reapp import changes, response_cache
+from reapp.models import RegisterBlog, BlogArticle, ChangeLogEntry, Course, CartItem
+
+WORDS = (
+    'python django api design data model query cache index search course lesson guide intro advanced '
+    'testing deploy async worker backend frontend react security payment cart article blog tutorial'
+).split()
+LEVELS = ['Beginner', 'Intermediate', 'Advanced']
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def row_rng(seed, kind, n):
+    # Every row has its own generator, so the data depends only on the seed,
+    # not on the chunk size or how chunks are spread over worker processes
+    return random.Random(f'{seed}:{kind}:{n}')
+
+
+def build_users(start, stop, password_hash):
+    return [
+        RegisterBlog(
+            First_name=f'First{n}', Last_name=f'Last{n}', name=f'seed-user-{n}',
+            Email=f'seed-user-{n}@example.com', phone_number=f'0300{n:07d}', password=password_hash,
+        )
+        for n in range(start, stop)
+    ]
+
+
+def build_articles(start, stop, seed):
+    articles = []
+    for n in range(start, stop):
+        rng = row_rng(seed, 'articles', n)
+        articles.append(BlogArticle(
+            title=sentence(rng, 6).capitalize(), slug=f'seed-article-{n}',
+            content='\n\n'.join(sentence(rng, rng.randint(40, 120)) for _ in range(rng.randint(3, 12))),
+        ))
+    return articles
+
+
+def build_courses(start, stop, seed):
+    courses = []
+    for n in range(start, stop):
+        rng = row_rng(seed, 'courses', n)
+        price = Decimal(rng.randint(10, 300))
+        courses.append(Course(
+            title=sentence(rng, 4).title(), slug=f'seed-course-{n}', description=sentence(rng, 40),
+            author=f'Author {rng.randint(1, 500)}', level=rng.choice(LEVELS), duration=f'{rng.randint(1, 40)}h',
+            lectures=rng.randint(5, 200), price=price, original_price=price * 2, discount='50%',
+            featured=rng.random() < 0.1, image='course_images/seed.jpg', content=sentence(rng, 600)[:5000],
+        ))
+    return courses
+
+
+def build_cart_items(start, stop, spec):
+    # Cart item i is position i % per_cart in owner i // per_cart's cart. An
+    # owner's courses are consecutive, so the (owner, course) unique
+    # constraints hold; owners are guests or users by a fixed rule.
+    per_cart = min(spec['items_per_cart'], spec['courses'])
+    planned = []
+    for i in range(start, stop):
+        owner, position = divmod(i, per_cart)
+        rng = row_rng(spec['seed'], 'cart', owner)
+        first_course = rng.randrange(spec['courses'])
+        planned.append((owner, (first_course + position) % spec['courses'], rng.randint(1, 3)))
+
+    user_names = {f'seed-user-{owner % spec["users"]}' for owner, _, _ in planned if not is_guest(owner, spec)}
+    user_ids = dict(RegisterBlog.objects.filter(name__in=user_names).values_list('name', 'id'))
+    course_slugs = {f'seed-course-{course}' for _, course, _ in planned}
+    course_ids = dict(Course.objects.filter(slug__in=course_slugs).values_list('slug', 'id'))
+
+    items = []
+    for owner, course, quantity in planned:
+        course_id = course_ids.get(f'seed-course-{course}')
+        if is_guest(owner, spec):
+            session_key = hashlib.sha1(f'{spec["seed"]}:guest:{owner}'.encode()).hexdigest()[:32]
+            items.append(CartItem(session_key=session_key, course_id=course_id, quantity=quantity))
+        else:
+            user_id = user_ids.get(f'seed-user-{owner % spec["users"]}')
+            items.append(CartItem(user_id=user_id, course_id=course_id, quantity=quantity))
+    # Users or courses missing from an earlier partial run are skipped
+    return [item for item in items if item.course_id and (item.session_key or item.user_id)]
+
+
+def is_guest(owner, spec):
+    return owner % 100 < spec['guest_percent']
+
+
+def seed_chunk(kind, index, spec):
+    start = index * spec['chunk_size']
+    stop = min(start + spec['chunk_size'], spec[kind])
+    if kind == 'users':
+        model, rows = RegisterBlog, build_users(start, stop, spec['password_hash'])
+    elif kind == 'articles':
+        model, rows = BlogArticle, build_articles(start, stop, spec['seed'])
+    elif kind == 'courses':
+        model, rows = Course, build_courses(start, stop, spec['seed'])
+    else:
+        model, rows = CartItem, build_cart_items(start, stop, spec)
+    if model in (BlogArticle, Course):
+        with transaction.atomic():
+            # Only rows that did not exist yet enter the change feed
+            existing = set(model.objects.filter(slug__in=[row.slug for row in rows]).values_list('slug', flat=True))
+            model.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+            created = model.objects.filter(slug__in=[row.slug for row in rows if row.slug not in existing])
+            changes.record_many(model, created.values_list('pk', 'slug'), ChangeLogEntry.CREATED)
+        return len(rows)
+    # ignore_conflicts makes re-running with the same seed a no-op
+    model.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    return len(rows)
+
+
+def init_worker():
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Generate deterministic, production-sized data for profiling (users, articles, courses, carts)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--articles', type=int, default=10000)
+        parser.add_argument('--courses', type=int, default=500)
+        parser.add_argument('--cart-items', type=int, default=20000)
+        parser.add_argument('--items-per-cart', type=int, default=3)
+        parser.add_argument('--guest-percent', type=int, default=30, help='Share of carts owned by guest sessions')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows generated and inserted per task')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes inserting chunks in parallel (SQLite only supports 1)')
+        parser.add_argument('--password', default='password', help='Plain password of every seeded user')
+
+    def handle(self, *args, **options):
+        if options['workers'] > 1 and connections['default'].vendor == 'sqlite':
+            raise CommandError('SQLite allows a single writer at a time; use --workers 1')
+        spec = {
+            key: options[key]
+            for key in ('users', 'articles', 'courses', 'cart_items', 'items_per_cart', 'guest_percent', 'seed',
+                        'chunk_size')
+        }
+        if not spec['courses'] or not spec['users']:
+            spec['cart_items'] = 0
+        # Hashed once: every seeded user shares the same salted hash
+        spec['password_hash'] = make_password(options['password'])
+
+        # Cart items reference users and courses, so they are seeded last
+        kinds = {'users': RegisterBlog, 'courses': Course, 'articles': BlogArticle, 'cart_items': CartItem}
+        for kind, model in kinds.items():
+            # Rows that already existed are skipped, so the table growth is what was inserted
+            before = model.objects.count()
+            chunks = range((spec[kind] + spec['chunk_size'] - 1) // spec['chunk_size'])
+            start = time.perf_counter()
+            if options['workers'] > 1:
+                connections.close_all()
+                with ProcessPoolExecutor(options['workers'], initializer=init_worker) as pool:
+                    generated = sum(pool.map(seed_chunk, [kind] * len(chunks), chunks, [spec] * len(chunks)))
+            else:
+                generated = sum(seed_chunk(kind, index, spec) for index in chunks)
+            elapsed = time.perf_counter() - start
+            created = model.objects.count() - before
+            self.stdout.write(
+                f"{kind}: {created} new of {generated} rows in {elapsed:.2f}s "
+                f"({generated / elapsed if elapsed else 0:.0f} rows/s)"
+            )
+
+        # bulk_create bypasses the signals that evict cached responses
+        response_cache.invalidate(response_cache.ARTICLES)
+        response_cache.invalidate(response_cache.COURSES)
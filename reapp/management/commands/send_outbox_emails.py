@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reapp import outbox
+
+
+class Command(BaseCommand):
+    help = 'Send queued OutboundEmail rows in batches, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE)
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Seconds to sleep when the outbox has nothing due')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once nothing is due instead of polling forever')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = outbox.drain(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f"sent={sent} failed={failed}")
+                continue
+            if options['once']:
+                return
+            time.sleep(options['poll_interval'])
@@ -0,0 +1,147 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+from . import compression
+
+logger = logging.getLogger('reapp.timing')
+
+
+class QueryRecorder:
+    def __init__(self, capture_sql):
+        self.capture_sql = capture_sql
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if self.capture_sql:
+                self.statements.append((elapsed, sql))
+
+
+class RequestTimingMiddleware:
+    # Counts SQL queries and splits wall time into view and render phases.
+    # DRF responses are rendered after the view returns, so the time between
+    # process_template_response and the end of the request is the rendering
+    # (JSON encoding) cost. Views that return a finished HttpResponse (the
+    # response cache) render inside the view, so they report no render phase.
+    # Every request is logged at DEBUG, slow ones as warnings.
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+
+    def __call__(self, request):
+        recorder = QueryRecorder(capture_sql=self.threshold is not None)
+        request._timing = {'view_start': None, 'view_end': None}
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        end = time.perf_counter()
+
+        view_start = request._timing['view_start']
+        view_end = request._timing['view_end'] or end
+        metrics = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'view_ms': round((view_end - view_start) * 1000, 2) if view_start is not None else None,
+            'render_ms': round((end - view_end) * 1000, 2) if request._timing['view_end'] is not None else None,
+            'total_ms': round((end - start) * 1000, 2),
+        }
+        timings = [f'db;dur={metrics["db_ms"]};desc="{recorder.count} queries"']
+        timings += [f'{phase};dur={metrics[f"{phase}_ms"]}' for phase in ('view', 'render')
+                    if metrics[f'{phase}_ms'] is not None]
+        timings.append(f'total;dur={metrics["total_ms"]}')
+        response['Server-Timing'] = ', '.join(timings)
+
+        if self.threshold is not None and metrics['total_ms'] >= self.threshold:
+            metrics['sql'] = [
+                {'ms': round(elapsed * 1000, 2), 'sql': sql} for elapsed, sql in recorder.statements
+            ]
+            logger.warning(json.dumps(metrics))
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps(metrics))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._timing['view_start'] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        request._timing['view_end'] = time.perf_counter()
+        return response
+
+
+class CompressionMiddleware:
+    # gzip/brotli for the read endpoints under COMPRESSED_PATHS. Compressed
+    # bodies are cached by content hash, so a hot list or detail response is
+    # compressed once per encoding rather than on every hit.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.compressible(request, response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compression.compress_chunks(response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        else:
+            compressed = compression.precompressed(response.content, encoding)
+            if isinstance(compressed, bytes):
+                if len(compressed) >= len(response.content):
+                    return response
+                response.content = compressed
+                response.headers['Content-Length'] = str(len(compressed))
+            else:
+                response = self.streamed(response, compressed)
+
+        # Like GZipMiddleware: the representation changed, so a strong ETag becomes weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def compressible(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if not (
+            request.method in ('GET', 'HEAD')
+            and response.status_code == 200
+            and request.path.startswith(tuple(settings.COMPRESSED_PATHS))
+            and not response.has_header('Content-Encoding')
+            and (content_type == 'application/json' or content_type.startswith('text/'))
+        ):
+            return False
+        if response.streaming:
+            return not response.is_async
+        return len(response.content) >= settings.COMPRESSION_MIN_SIZE
+
+    def streamed(self, response, chunks):
+        streamed = StreamingHttpResponse(chunks, status=response.status_code)
+        for header, value in response.items():
+            streamed.headers[header] = value
+        del streamed.headers['Content-Length']
+        streamed.cookies = response.cookies
+        return streamed
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+from reapp.migrations._search_0009 import SEARCH_INDEXES, TRIGGER_SUFFIXES, sqlite_statements
+
+# Full-text indexes used by reapp.search. SQLite gets external-content FTS5
+# tables kept in sync by triggers; MySQL maintains its FULLTEXT indexes
+# natively. Other databases fall back to icontains and need no index.
+
+
+def create_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, columns in SEARCH_INDEXES.items():
+        if vendor == 'sqlite':
+            statements = sqlite_statements(table, columns)
+        elif vendor == 'mysql':
+            statements = [f"ALTER TABLE {table} ADD FULLTEXT INDEX {table}_fulltext ({', '.join(columns)})"]
+        else:
+            statements = []
+        for statement in statements:
+            schema_editor.execute(statement)
+
+
+def drop_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in SEARCH_INDEXES:
+        if vendor == 'sqlite':
+            for suffix in TRIGGER_SUFFIXES:
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+        elif vendor == 'mysql':
+            schema_editor.execute(f"ALTER TABLE {table} DROP INDEX {table}_fulltext")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reapp', '0008_outboundemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
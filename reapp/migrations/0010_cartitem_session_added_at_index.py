@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reapp', '0009_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(fields=['session_key', 'added_at'], name='reapp_carti_session_5be3ba_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:14
+
+from django.db import migrations, models
+
+from reapp.migrations._search_0009 import restore_sqlite_triggers
+
+
+def restore_search_triggers(apps, schema_editor):
+    # SQLite adds the column by rebuilding reapp_course, which drops its FTS triggers
+    restore_sqlite_triggers(schema_editor, ['reapp_course'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reapp', '0010_cartitem_session_added_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+from reapp.migrations._search_0009 import restore_sqlite_triggers
+
+
+def restore_search_triggers(apps, schema_editor):
+    # SQLite adds these NOT NULL columns by rebuilding both tables, which
+    # drops their FTS triggers
+    restore_sqlite_triggers(schema_editor, ['reapp_blogarticle', 'reapp_course'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reapp', '0011_course_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogarticle',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='blogarticle',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
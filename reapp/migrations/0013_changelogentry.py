@@ -0,0 +1,42 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # Existing rows enter the feed as created, so a client syncing from 0 sees everything
+    ChangeLogEntry = apps.get_model('reapp', 'ChangeLogEntry')
+    for object_type, model_name in (('article', 'BlogArticle'), ('course', 'Course')):
+        rows = apps.get_model('reapp', model_name).objects.order_by('pk').values_list('pk', 'slug', 'updated_at')
+        ChangeLogEntry.objects.bulk_create(
+            (
+                ChangeLogEntry(object_type=object_type, object_id=pk, slug=slug, action='created', changed_at=updated_at)
+                for pk, slug, updated_at in rows.iterator(chunk_size=2000)
+            ),
+            batch_size=1000,
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reapp', '0012_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('article', 'Article'), ('course', 'Course')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('slug', models.CharField(max_length=255)),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=10)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['object_type', 'id'], name='reapp_chang_object__aa223f_idx')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Frozen copy of the full-text index shape created by 0009_search_indexes,
+# for that migration and the later ones that restore its SQLite triggers.
+# It must not import models or reapp.search and must never be edited: a
+# migration that changes the indexed columns brings its own copy.
+# (The migration loader skips modules whose name starts with an underscore.)
+
+# Table: indexed columns
+SEARCH_INDEXES = {
+    'reapp_blogarticle': ['title', 'content'],
+    'reapp_course': ['title', 'description', 'content'],
+}
+TRIGGER_SUFFIXES = ('ai', 'ad', 'au')
+
+
+def sqlite_trigger_statements(table, columns):
+    fts = f'{table}_fts'
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{c}' for c in columns)
+    old_values = ', '.join(f'old.{c}' for c in columns)
+    return [
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def sqlite_statements(table, columns):
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({', '.join(columns)}, content='{table}', content_rowid='id', "
+        f"tokenize='porter unicode61')",
+        *sqlite_trigger_statements(table, columns),
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def restore_sqlite_triggers(schema_editor, tables):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in tables:
+        for suffix in TRIGGER_SUFFIXES:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+        for statement in sqlite_trigger_statements(table, SEARCH_INDEXES[table]):
+            schema_editor.execute(statement)
+        schema_editor.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
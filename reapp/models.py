@@ -1,6 +1,11 @@
-from django.db import models
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models.functions import Least, Length, Substr
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db.models import ImageField
+from django.utils import timezone
 from django.utils.text import slugify
 from django.urls import reverse
 
@@ -48,24 +53,108 @@ class LoginBlog(models.Model):
         return self.username
 
 
-class BlogArticle(models.Model):
+class BlogArticleQuerySet(models.QuerySet):
+    EXCERPT_LENGTH = 200
+    SLUG_QUERY_BATCH = 200
+
+    def for_listing(self):
+        # Never pull the full content column for list views; the database
+        # computes the excerpt and the length instead.
+        return self.only('id', 'slug', 'title').annotate(
+            excerpt=Substr('content', 1, self.EXCERPT_LENGTH),
+            content_length=Length('content'),
+        )
+
+    def unique_slugs(self, base_slugs, reserved=()):
+        # Returns a free slug for every base slug ("base", then "base-1",
+        # "base-2", ...). Existing candidates for all bases come back from a
+        # single indexed prefix query, so the cost does not grow with the
+        # number of articles that already share a title. Slugs in `reserved`
+        # are treated as taken even though they are not saved yet.
+        bases = sorted(set(base_slugs))
+        taken = set(reserved)
+        # SQLite's LIKE is case-insensitive and cannot use the slug index, but
+        # its binary collation makes the equivalent range scan exact
+        binary_collation = connections[self.db].vendor == 'sqlite'
+        # Large batches are split to stay under SQLite's expression depth limit
+        for i in range(0, len(bases), self.SLUG_QUERY_BATCH):
+            candidates = models.Q()
+            for base in bases[i:i + self.SLUG_QUERY_BATCH]:
+                if binary_collation:
+                    prefix = models.Q(slug__gt=f'{base}-', slug__lt=f'{base}.')
+                else:
+                    prefix = models.Q(slug__startswith=f'{base}-')
+                candidates |= models.Q(slug=base) | prefix
+            taken.update(self.filter(candidates).values_list('slug', flat=True))
+
+        used = defaultdict(set)
+
+        def take(slug):
+            taken.add(slug)
+            prefix, _, num = slug.rpartition('-')
+            if num.isascii() and num.isdigit():
+                used[prefix].add(int(num))
+
+        for slug in list(taken):
+            take(slug)
+
+        slugs = []
+        for base in base_slugs:
+            slug = base
+            if base in taken:
+                num = 1
+                while num in used[base]:
+                    num += 1
+                slug = f"{base}-{num}"
+            take(slug)
+            slugs.append(slug)
+        return slugs
+
+
+class LoadedSlugMixin:
+    # Remembers the slug as stored, so a rename can evict the cached
+    # responses of the old slug as well as the new one
+    loaded_slug = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_slug = instance.__dict__.get('slug')
+        return instance
+
+
+class BlogArticle(LoadedSlugMixin, models.Model):
     title = models.CharField(max_length=255)
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = BlogArticleQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
+    SLUG_ATTEMPTS = 5
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.title)[:240]
-            slug = base_slug
-            num = 1
-            while BlogArticle.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{num}"
-                num += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        if self.slug:
+            return super().save(*args, **kwargs)
+
+        base_slug = slugify(self.title)[:240]
+        for attempt in range(self.SLUG_ATTEMPTS):
+            self.slug = BlogArticle.objects.unique_slugs([base_slug])[0]
+            try:
+                # Savepoint so a concurrent writer taking the same slug only
+                # costs a retry, not the surrounding transaction
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # Only a slug taken in the meantime is worth a retry
+                taken = BlogArticle.objects.filter(slug=self.slug).exists()
+                if not taken or attempt == self.SLUG_ATTEMPTS - 1:
+                    self.slug = ''
+                    raise
 
 
 class BlogContactUs(models.Model):
@@ -77,7 +166,7 @@ class BlogContactUs(models.Model):
         return self.name
 
 
-class Course(models.Model):
+class Course(LoadedSlugMixin, models.Model):
     title = models.CharField(max_length=255)
     slug = models.SlugField(unique=True)
     description = models.TextField()
@@ -91,6 +180,10 @@ class Course(models.Model):
     featured = models.BooleanField(default=False)
     image = models.ImageField(upload_to='course_images/')
     content = models.TextField(max_length=5000, null=True, blank=True)
+    # Resized copies of image, filled in by reapp.images after save
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -101,6 +194,28 @@ class Course(models.Model):
         return self.title
 
 
+class CartItemQuerySet(models.QuerySet):
+    def add_quantities(self, quantities, user=None, session_key=None):
+        # Adds {course_id: quantity} to one owner's cart: missing rows are
+        # inserted empty, then every row is bumped by a single UPDATE with
+        # F(), so concurrent adds never overwrite each other's counts. Totals
+        # stop at CART_MAX_QUANTITY instead of overflowing the column.
+        owner = {'user': user} if user is not None else {'session_key': session_key}
+        with transaction.atomic(using=self.db):
+            self.bulk_create(
+                [CartItem(course_id=course_id, quantity=0, **owner) for course_id in quantities],
+                ignore_conflicts=True,
+            )
+            added = models.F('quantity') + models.Case(
+                *[models.When(course_id=course_id, then=quantity) for course_id, quantity in quantities.items()],
+                default=0, output_field=models.PositiveIntegerField(),
+            )
+            self.filter(course_id__in=quantities, **owner).update(quantity=Least(
+                added, models.Value(settings.CART_MAX_QUANTITY), output_field=models.PositiveIntegerField(),
+            ))
+        return self.filter(course_id__in=quantities, **owner)
+
+
 class CartItem(models.Model):
     user = models.ForeignKey(RegisterBlog, on_delete=models.CASCADE, related_name="cart_items", null=True, blank=True)
     session_key = models.CharField(max_length=40, null=True, blank=True)
@@ -108,6 +223,8 @@ class CartItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CartItemQuerySet.as_manager()
+
     @property
     def total_price(self):
         return self.quantity * self.course.price
@@ -118,8 +235,74 @@ class CartItem(models.Model):
     class Meta:
         unique_together = (('user', 'course'), ('session_key', 'course'))
         ordering = ['-added_at']
+        # For purge_guest_carts, which looks for old rows per session
+        indexes = [models.Index(fields=['session_key', 'added_at'])]
 
 
 class PaymentVoucher(models.Model):
     voucher = models.ImageField(upload_to='voucher_images/')
 
+
+class OutboundEmail(models.Model):
+    PENDING = 'pending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (DEAD, 'Dead'),
+    ]
+
+    subject = models.CharField(max_length=500)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=200, null=True, blank=True)
+    to = models.JSONField()
+    # Storage name of an image embedded in html_body as cid:<inline_image_cid>
+    inline_image = models.CharField(max_length=255, blank=True)
+    inline_image_cid = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+
+class ChangeLogEntry(models.Model):
+    # Append-only record of article and course writes for GET /api/changes/.
+    # The auto-increment id is the sequence clients resume from; deletes
+    # leave a tombstone entry.
+    ARTICLE = 'article'
+    COURSE = 'course'
+    TYPE_CHOICES = [
+        (ARTICLE, 'Article'),
+        (COURSE, 'Course'),
+    ]
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    ]
+
+    object_type = models.CharField(max_length=10, choices=TYPE_CHOICES)
+    object_id = models.BigIntegerField()
+    slug = models.CharField(max_length=255)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"#{self.pk} {self.object_type} {self.slug} {self.action}"
+
+    class Meta:
+        # The latest entry of one type is the version of its list endpoint
+        indexes = [models.Index(fields=['object_type', 'id'])]
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from email.mime.image import MIMEImage
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+def enqueue(subject, body, to, from_email=None, html_body='', inline_image='', inline_image_cid=''):
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        to=list(to),
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        html_body=html_body,
+        inline_image=inline_image,
+        inline_image_cid=inline_image_cid,
+    )
+
+
+def build_message(email, connection=None):
+    message = EmailMultiAlternatives(email.subject, email.body, email.from_email, email.to, connection=connection)
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    if email.inline_image:
+        with default_storage.open(email.inline_image, 'rb') as img_file:
+            image = MIMEImage(img_file.read())
+        image.add_header('Content-ID', f'<{email.inline_image_cid}>')
+        image.add_header('Content-Disposition', 'inline', filename=email.inline_image)
+        message.attach(image)
+    return message
+
+
+def claim(batch_size):
+    # Lease due rows by pushing next_attempt_at forward, so a crashed worker's
+    # batch becomes due again and concurrent workers never share rows.
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if batch:
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                next_attempt_at=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+            )
+    return batch
+
+
+def _failed(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = OutboundEmail.DEAD
+    else:
+        backoff = settings.EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** (email.attempts - 1)
+        email.next_attempt_at = timezone.now() + timedelta(seconds=backoff)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def drain(batch_size=None, connection=None):
+    # Sends one batch over a single SMTP connection. Returns (sent, failed).
+    batch = claim(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = connection or get_connection()
+    try:
+        for email in batch:
+            try:
+                # Opened inside the guard, so a server that is down counts as
+                # a failed attempt for each row instead of crashing the worker.
+                # open() is a no-op while the connection is already up.
+                connection.open()
+                connection.send_messages([build_message(email, connection)])
+            except Exception as e:
+                _failed(email, e)
+                failed += 1
+                # The server may have dropped us; the next row reconnects
+                _close(connection)
+            else:
+                email.status = OutboundEmail.SENT
+                email.attempts += 1
+                email.sent_at = timezone.now()
+                email.save(update_fields=['status', 'attempts', 'sent_at'])
+                sent += 1
+    finally:
+        _close(connection)
+    return sent, failed
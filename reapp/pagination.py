@@ -0,0 +1,17 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class ArticleCursorPagination(CursorPagination):
+    # Keyset pagination on the primary key, newest first. The cursor encodes the
+    # last seen id so every page is a bounded index range scan.
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
+
+
+class SearchPagination(PageNumberPagination):
+    # Ranked results have no stable keyset, so search pages by number
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
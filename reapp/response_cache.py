@@ -0,0 +1,162 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .renderers import ORJSONRenderer
+
+ARTICLES = 'articles'
+COURSES = 'courses'
+
+# The only query parameters the cached views read (pagination and sparse
+# fieldsets); anything else must not mint a new cache entry
+VARY_PARAMS = ('cursor', 'page_size', 'fields', 'omit')
+
+HITS_KEY = 'response:stats:hits'
+MISSES_KEY = 'response:stats:misses'
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _digest(value):
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def variant(request):
+    # Image fields render absolute URLs, so the host is part of the
+    # representation. Kept on the request, as the conditional GET
+    # validators (reapp.conditional) need it as well.
+    if not hasattr(request, '_response_variant'):
+        params = [f'{name}={",".join(request.GET.getlist(name))}' for name in VARY_PARAMS if name in request.GET]
+        request._response_variant = _digest(request.build_absolute_uri('/') + '?' + '&'.join(params))
+    return request._response_variant
+
+
+def _generation(cache, scope):
+    key = f'response:{scope}:generation'
+    generation = cache.get(key)
+    if generation is None:
+        # Seeded from the clock so a culled counter never comes back as an old value
+        generation = time.time_ns()
+        if not cache.add(key, generation, None):
+            generation = cache.get(key, generation)
+    return generation
+
+
+def _count(cache, key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def _record(cache, body):
+    _count(cache, MISSES_KEY if body is None else HITS_KEY)
+    return body
+
+
+class CachedResponse:
+    def __init__(self, key):
+        self.cache = get_cache()
+        self.key = key
+
+    def get(self):
+        return _record(self.cache, self.cache.get(self.key))
+
+    def set(self, data):
+        body = ORJSONRenderer().render(data)
+        self.cache.set(self.key, body, settings.RESPONSE_CACHE_TIMEOUT)
+        return body
+
+
+def _detail_scope(namespace, slug):
+    return f'{namespace}:detail:{_digest(slug)}'
+
+
+def for_detail(namespace, slug, request):
+    # Each variant is its own entry; bumping the object's generation orphans them all
+    cache = get_cache()
+    scope = _detail_scope(namespace, slug)
+    return CachedResponse(f'response:{scope}:{_generation(cache, scope)}:{variant(request)}')
+
+
+def for_list(namespace, request):
+    cache = get_cache()
+    return CachedResponse(f'response:{namespace}:list:{_generation(cache, namespace)}:{variant(request)}')
+
+
+def catalog_version(request, token):
+    # token moves with every course write (the course list version); the
+    # host is mixed in as image URLs in the catalog are absolute
+    return _digest(f'{token}|{request.build_absolute_uri("/")}')[:20]
+
+
+def catalog_snapshot(request, token, build):
+    # Returns (version, body); build() only runs when the version is new
+    cache = get_cache()
+    version = catalog_version(request, token)
+    key = f'response:{COURSES}:catalog:{version}'
+    body = _record(cache, cache.get(key))
+    if body is None:
+        body = ORJSONRenderer().render({'version': version, 'courses': build()})
+        cache.set(key, body, settings.RESPONSE_CACHE_TIMEOUT)
+    return version, body
+
+
+def _version(cache, key, lookup):
+    version = cache.get(key)
+    if version is None:
+        version = lookup()
+        if version is not None:
+            cache.set(key, version, settings.RESPONSE_CACHE_TIMEOUT)
+    return version
+
+
+def detail_version(namespace, slug, lookup):
+    # Validators of one object for conditional GETs, under the same
+    # generation as its responses: a reader that looked them up before a
+    # write committed stores them under a generation nobody reads any more.
+    # None (not cached) when the object does not exist.
+    cache = get_cache()
+    scope = _detail_scope(namespace, slug)
+    return _version(cache, f'response:{scope}:version:{_generation(cache, scope)}', lookup)
+
+
+def list_version(namespace, lookup):
+    cache = get_cache()
+    return _version(cache, f'response:{namespace}:list-version:{_generation(cache, namespace)}', lookup)
+
+
+def json_response(body, status=200):
+    return HttpResponse(body, status=status, content_type='application/json')
+
+
+def _bump(cache, scope):
+    key = f'response:{scope}:generation'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+
+
+def invalidate(namespace, slug=None):
+    cache = get_cache()
+    if slug is not None:
+        _bump(cache, _detail_scope(namespace, slug))
+    # Bumping the generation orphans every cached list page of the namespace
+    _bump(cache, namespace)
+
+
+def stats():
+    cache = get_cache()
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {'hits': counters.get(HITS_KEY, 0), 'misses': counters.get(MISSES_KEY, 0)}
+
+
+def reset_stats():
+    get_cache().delete_many([HITS_KEY, MISSES_KEY])
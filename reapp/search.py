@@ -0,0 +1,196 @@
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import connection
+from django.db.models import Case, Q, Value, When
+
+from .models import BlogArticle, Course
+
+# Indexed columns and their ranking weights, in the order the indexes were
+# created by migration 0009_search_indexes
+SEARCH_FIELDS = {
+    BlogArticle: {'title': 10.0, 'content': 1.0},
+    Course: {'title': 10.0, 'description': 2.0, 'content': 1.0},
+}
+
+
+# Table: indexed columns, for the SQLite triggers restored after migrate.
+# Migrations use their own frozen copy (reapp/migrations/_search_0009.py);
+# changing SEARCH_FIELDS needs a migration that rebuilds the indexes.
+SEARCH_INDEXES = {model._meta.db_table: list(fields) for model, fields in SEARCH_FIELDS.items()}
+TRIGGER_SUFFIXES = ('ai', 'ad', 'au')
+
+
+def terms(query):
+    return re.findall(r'\w+', query)[:20]
+
+
+def sqlite_trigger_statements(table, columns):
+    fts = f'{table}_fts'
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{c}' for c in columns)
+    old_values = ', '.join(f'old.{c}' for c in columns)
+    return [
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def sqlite_statements(table, columns):
+    # External-content FTS5 table kept in sync by triggers, so bulk_create
+    # and queryset.update() are covered too
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({', '.join(columns)}, content='{table}', content_rowid='id', "
+        f"tokenize='porter unicode61')",
+        *sqlite_trigger_statements(table, columns),
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def restore_sqlite_triggers(schema_editor, tables=SEARCH_INDEXES):
+    # SQLite alters most columns by copying the table into a new one, which
+    # drops its triggers. Migrations that rebuild an indexed table run this
+    # afterwards; the index is rebuilt for writes made in between.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in tables:
+        for suffix in TRIGGER_SUFFIXES:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+        for statement in sqlite_trigger_statements(table, SEARCH_INDEXES[table]):
+            schema_editor.execute(statement)
+        schema_editor.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def missing_sqlite_triggers(db_connection):
+    # Tables whose FTS table exists but lost one of its sync triggers
+    with db_connection.cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = set(cursor.fetchall())
+    return [
+        table for table in SEARCH_INDEXES
+        if ('table', f'{table}_fts') in existing
+        and any(('trigger', f'{table}_fts_{suffix}') not in existing for suffix in TRIGGER_SUFFIXES)
+    ]
+
+
+class SQLiteFTS5Backend:
+    def match_expression(self, query):
+        # Quote every term so user input can never become FTS5 syntax; the
+        # last term is a prefix so results update while the user types
+        quoted = [f'"{term}"' for term in terms(query)]
+        if quoted:
+            quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def ranked_ids(self, model, query, limit, offset):
+        fts = f'{model._meta.db_table}_fts'
+        weights = ', '.join(str(w) for w in SEARCH_FIELDS[model].values())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s ORDER BY bm25({fts}, {weights}) LIMIT %s OFFSET %s",
+                [self.match_expression(query), limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def count(self, model, query):
+        fts = f'{model._meta.db_table}_fts'
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {fts} WHERE {fts} MATCH %s", [self.match_expression(query)])
+            return cursor.fetchone()[0]
+
+
+class MySQLFullTextBackend:
+    def match_expression(self, query):
+        # Boolean mode with every term required gives the same AND semantics
+        # as the FTS5 backend
+        required = [f'+{term}' for term in terms(query)]
+        if required:
+            required[-1] += '*'
+        return ' '.join(required)
+
+    def match(self, model):
+        columns = ', '.join(SEARCH_FIELDS[model])
+        return f"MATCH({columns}) AGAINST (%s IN BOOLEAN MODE)"
+
+    def ranked_ids(self, model, query, limit, offset):
+        match = self.match(model)
+        expression = self.match_expression(query)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM {model._meta.db_table} WHERE {match} ORDER BY {match} DESC LIMIT %s OFFSET %s",
+                [expression, expression, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def count(self, model, query):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {model._meta.db_table} WHERE {self.match(model)}",
+                [self.match_expression(query)],
+            )
+            return cursor.fetchone()[0]
+
+
+class IContainsBackend:
+    # Databases without a full-text index here (PostgreSQL and the rest):
+    # every term must appear in one of the columns, ranked by the weights of
+    # the columns it appears in. Scans the table, but stays correct.
+    def matching(self, model, query):
+        fields = SEARCH_FIELDS[model]
+        condition = Q()
+        rank = Value(0.0)
+        for term in terms(query):
+            condition &= reduce(or_, (Q(**{f'{field}__icontains': term}) for field in fields))
+            for field, weight in fields.items():
+                rank += Case(When(**{f'{field}__icontains': term}, then=Value(weight)), default=Value(0.0))
+        return model._default_manager.filter(condition).annotate(search_rank=rank)
+
+    def ranked_ids(self, model, query, limit, offset):
+        ranked = self.matching(model, query).order_by('-search_rank', '-pk').values_list('pk', flat=True)
+        return list(ranked[offset:offset + limit])
+
+    def count(self, model, query):
+        return self.matching(model, query).count()
+
+
+BACKENDS = {
+    'sqlite': SQLiteFTS5Backend,
+    'mysql': MySQLFullTextBackend,
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, IContainsBackend)()
+
+
+class SearchResults:
+    # Lazy, sliceable result set so DRF's page number pagination can drive
+    # the ranked index query directly.
+    def __init__(self, queryset, query):
+        self.queryset = queryset
+        self.query = query
+        self.backend = get_backend()
+
+    def count(self):
+        if not terms(self.query):
+            return 0
+        return self.backend.count(self.queryset.model, self.query)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('SearchResults only supports slicing')
+        if not terms(self.query):
+            return []
+        ids = self.backend.ranked_ids(self.queryset.model, self.query, index.stop - index.start, index.start)
+        rows = self.queryset.in_bulk(ids)
+        return [rows[pk] for pk in ids if pk in rows]
@@ -1,7 +1,56 @@
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from . import images
+from .tokens import RotatingRefreshToken
 from .models import RegisterBlog, LoginBlog, BlogArticle, BlogContactUs, Course, CartItem, PaymentVoucher
 
 
+def _split(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsetsMixin:
+    # ?fields=a,b keeps only those fields of the top-level object(s) of a GET
+    # and ?omit=c drops fields. get_only_fields() lists the model columns
+    # the remaining fields read, for queryset.only(); Meta.source_fields
+    # names the columns of fields that are not model fields themselves.
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS or self.context.get('sparse_fieldsets') is False:
+            return fields
+        # Nested serializers (a cart item's course) keep all their fields
+        top_level = self.parent is None or (
+            isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None
+        )
+        if not top_level:
+            return fields
+        wanted = _split(request.query_params.get('fields', ''))
+        omitted = _split(request.query_params.get('omit', ''))
+        return {
+            name: field for name, field in fields.items()
+            if (not wanted or name in wanted or field.write_only) and name not in omitted
+        }
+
+    def get_only_fields(self):
+        opts = self.Meta.model._meta
+        concrete = {field.name for field in opts.concrete_fields}
+        source_fields = getattr(self.Meta, 'source_fields', {})
+        columns = {opts.pk.name}
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            if name in source_fields:
+                columns.update(source_fields[name])
+            elif field.source in concrete:
+                columns.add(field.source)
+                if isinstance(field, SparseFieldsetsMixin):
+                    columns.update(f'{field.source}__{column}' for column in field.get_only_fields())
+        return sorted(columns)
+
+
 class RegisterSerializers(serializers.ModelSerializer):
     class Meta:
         model = RegisterBlog
@@ -22,26 +71,56 @@ class LoginSerializers(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class BlogArticleSerializer(serializers.ModelSerializer):
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    token_class = RotatingRefreshToken
+
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+
+class BlogArticleSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = BlogArticle
         fields = ['slug', 'title', 'content']
 
 
+class BlogArticleListSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    # Expects a queryset from BlogArticle.objects.for_listing()
+    excerpt = serializers.CharField(read_only=True)
+    content_length = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = BlogArticle
+        fields = ['slug', 'title', 'excerpt', 'content_length']
+
+
 class BlogContactUsSerializer(serializers.ModelSerializer):
     class Meta:
         model = BlogContactUs
         fields = '__all__'
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Course
-        fields = '__all__'
+        exclude = ['image_variants', 'created_at', 'updated_at']
+        source_fields = {'srcset': ['image', 'image_variants']}
 
+    def get_srcset(self, obj):
+        return images.srcset(obj, self.context.get('request'))
 
-class CartItemSerializer(serializers.ModelSerializer):
-    course = CourseSerializer(read_only=True)
+
+class CourseCardSerializer(CourseSerializer):
+    # Course lists and cart items; leaves out the long description and content
+    class Meta(CourseSerializer.Meta):
+        exclude = ['description', 'content', 'image_variants', 'created_at', 'updated_at']
+
+
+class CartItemSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    course = CourseCardSerializer(read_only=True)
     course_id = serializers.PrimaryKeyRelatedField(
         queryset=Course.objects.all(),
         source='course',
@@ -62,6 +141,7 @@ class CartItemSerializer(serializers.ModelSerializer):
             'total_price'
         ]
         read_only_fields = ['user', 'session_key', 'added_at']
+        source_fields = {'total_price': ['quantity', 'course__price']}
 
     def get_total_price(self, obj):
         # Handle both model instances and dictionaries
@@ -75,18 +155,43 @@ class CartItemSerializer(serializers.ModelSerializer):
         return value
 
 
+class CartBatchItemSerializer(serializers.Serializer):
+    course_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+    def validate_quantity(self, value):
+        if value > settings.CART_MAX_QUANTITY:
+            raise serializers.ValidationError(f"Quantity must be at most {settings.CART_MAX_QUANTITY}")
+        return value
+
+
+class CartBatchSerializer(serializers.Serializer):
+    items = CartBatchItemSerializer(many=True, allow_empty=False, max_length=100)
+
+    def validate_items(self, items):
+        # Repeated courses are added up; all ids are checked with one query
+        quantities = {}
+        for item in items:
+            quantities[item['course_id']] = quantities.get(item['course_id'], 0) + item['quantity']
+        limit = settings.CART_MAX_QUANTITY
+        too_many = sorted(course_id for course_id, quantity in quantities.items() if quantity > limit)
+        if too_many:
+            raise serializers.ValidationError(
+                f"Quantity must be at most {limit} per course: {', '.join(map(str, too_many))}"
+            )
+        existing = set(Course.objects.filter(pk__in=quantities).values_list('pk', flat=True))
+        missing = sorted(set(quantities) - existing)
+        if missing:
+            raise serializers.ValidationError(f"Courses do not exist: {', '.join(map(str, missing))}")
+        return quantities
+
+
 class CartSummarySerializer(serializers.Serializer):
-    items = CartItemSerializer(many=True)
+    # items is left out unless the caller asked for it
+    items = CartItemSerializer(many=True, required=False)
     total_items = serializers.IntegerField()
     grand_total = serializers.DecimalField(max_digits=10, decimal_places=2)
 
-    def to_representation(self, instance):
-        return {
-            'items': CartItemSerializer(instance['items'], many=True).data,
-            'total_items': instance['total_items'],
-            'grand_total': instance['grand_total']
-            }
-
 
 class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
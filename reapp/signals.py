@@ -0,0 +1,65 @@
+from functools import partial
+
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from . import changes, images, response_cache, search
+from .authentication import invalidate_user
+from .models import BlogArticle, ChangeLogEntry, Course, RegisterBlog
+
+
+def evict_responses(namespace, instance):
+    # Evict after commit so a concurrent reader cannot re-cache the old row.
+    # A renamed object is evicted under the slug it was loaded with too.
+    for slug in {instance.slug, instance.loaded_slug} - {None, ''}:
+        transaction.on_commit(partial(response_cache.invalidate, namespace, slug))
+    instance.loaded_slug = instance.slug
+
+
+@receiver([post_save, post_delete], sender=BlogArticle)
+def evict_article_responses(sender, instance, **kwargs):
+    evict_responses(response_cache.ARTICLES, instance)
+
+
+@receiver([post_save, post_delete], sender=Course)
+def evict_course_responses(sender, instance, **kwargs):
+    evict_responses(response_cache.COURSES, instance)
+
+
+@receiver(post_save, sender=BlogArticle)
+@receiver(post_save, sender=Course)
+def record_change(sender, instance, created, **kwargs):
+    changes.record(instance, ChangeLogEntry.CREATED if created else ChangeLogEntry.UPDATED)
+
+
+@receiver(post_delete, sender=BlogArticle)
+@receiver(post_delete, sender=Course)
+def record_deletion(sender, instance, **kwargs):
+    # Runs inside the delete's transaction, so the tombstone commits with it
+    changes.record(instance, ChangeLogEntry.DELETED)
+
+
+@receiver(post_save, sender=Course)
+def build_course_image_variants(sender, instance, raw=False, **kwargs):
+    # Only when the upload changed; the variants are written with update(), which does not re-enter here
+    if not raw and images.needs_variants(instance):
+        transaction.on_commit(partial(images.schedule, instance.pk))
+
+
+@receiver([post_save, post_delete], sender=RegisterBlog)
+def evict_cached_user(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_user, instance.pk))
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    # Safety net for a migration that rebuilt an indexed SQLite table without
+    # calling search.restore_sqlite_triggers(), which would leave search stale
+    connection = connections[using]
+    if sender.name != 'reapp' or connection.vendor != 'sqlite':
+        return
+    missing = search.missing_sqlite_triggers(connection)
+    if missing:
+        with connection.schema_editor() as schema_editor:
+            search.restore_sqlite_triggers(schema_editor, missing)
@@ -1,3 +1,1101 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.apps import apps
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from django.utils.translation import gettext_lazy as _
+from PIL import Image
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import compression, guest_cart, images, outbox, response_cache, search, signals
+from .models import RegisterBlog, BlogArticle, ChangeLogEntry, Course, CartItem, OutboundEmail
+from .parsers import ORJSONParser
+from .renderers import ORJSONRenderer
+from .serializers import CartItemSerializer
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_upload(name='voucher.png'):
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8), 'white').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+def selected_columns(queries, table):
+    # The last SELECT loads the rows; the one before it is the version lookup
+    sql = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT')][-1]
+    return set(re.findall(rf'"{table}"\."(\w+)"', sql.split(' FROM ')[0]))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ApiTestCase(TestCase):
+    # Shared fixture: empty caches, a student and a staff account
+    def setUp(self):
+        self.clear_caches()
+        self.user = RegisterBlog.objects.create_user(
+            'student@example.com', 'student', 'secret-pass', First_name='Stu', Last_name='Dent'
+        )
+        self.staff = RegisterBlog.objects.create_user(
+            'staff@example.com', 'staff', 'secret-pass', First_name='Sta', Last_name='Ff', is_staff=True
+        )
+
+    def clear_caches(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def describe(self, queries):
+        return '\n'.join(f"{i}. {query['sql']}" for i, query in enumerate(queries.captured_queries, start=1))
+
+    def login(self):
+        response = self.client.post('/api/login/', {'username': 'student', 'password': 'secret-pass'})
+        return response.json()['refresh_token']
+
+    def auth(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    DEFAULT_FROM_EMAIL='noreply@example.com',
+    ADMIN_EMAIL='admin@example.com',
+    MEDIA_ROOT=MEDIA_ROOT,
+    SLOW_REQUEST_THRESHOLD_MS=None,
+)
+class QueryCountTestCase(ApiTestCase):
+    # Every route gets an absolute query budget, and list routes are run
+    # again after the tables grow tenfold: a query count that changes with
+    # the row count is an N+1 and fails with the offending SQL.
+    SMALL = 5
+    LARGE = 50
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        self.seed(self.SMALL)
+
+    def seed(self, count):
+        start = Course.objects.count()
+        BlogArticle.objects.bulk_create(
+            BlogArticle(title=f'Article {n}', slug=f'article-{n}', content='lorem ipsum ' * 200)
+            for n in range(start, start + count)
+        )
+        courses = Course.objects.bulk_create(
+            Course(
+                title=f'Course {n}', slug=f'course-{n}', description='Learn things', author='Author',
+                level='Beginner', duration='3h', lectures=10, price='10.00', original_price='20.00',
+                discount='50%', image='course_images/course.jpg', content='content ' * 500,
+            )
+            for n in range(start, start + count)
+        )
+        CartItem.objects.bulk_create(CartItem(user=self.user, course=course, quantity=2) for course in courses)
+
+    def request(self, method, path, **kwargs):
+        # Every measured request is a cold cache and a first visit
+        self.clear_caches()
+        self.client.cookies.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(path, **kwargs)
+        return response, queries
+
+    def assertQueryBudget(self, limit, method, path, status=200, **kwargs):
+        response, queries = self.request(method, path, **kwargs)
+        self.assertEqual(response.status_code, status, response.content[:500])
+        if len(queries) > limit:
+            self.fail(
+                f"{method.upper()} {path} ran {len(queries)} queries, budget is {limit}:\n{self.describe(queries)}"
+            )
+        return response
+
+    def assertConstantQueries(self, limit, method, path, **kwargs):
+        response, small = self.request(method, path, **kwargs)
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        self.seed(self.LARGE - self.SMALL)
+        response, large = self.request(method, path, **kwargs)
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        if len(large) != len(small):
+            self.fail(
+                f"{method.upper()} {path} went from {len(small)} to {len(large)} queries when the tables grew "
+                f"from {self.SMALL} to {self.LARGE} rows:\n{self.describe(large)}"
+            )
+        if len(large) > limit:
+            self.fail(
+                f"{method.upper()} {path} ran {len(large)} queries, budget is {limit}:\n{self.describe(large)}"
+            )
+        return response
+
+    def test_register(self):
+        self.assertQueryBudget(3, 'post', '/api/register/', status=201, content_type='application/json', data={
+            'First_name': 'New', 'Last_name': 'User', 'name': 'newuser',
+            'Email': 'new@example.com', 'password': 'secret-pass',
+        })
+
+    def test_login(self):
+        self.assertQueryBudget(2, 'post', '/api/login/', data={'username': 'student', 'password': 'secret-pass'})
+
+    def test_token_refresh(self):
+        refresh = self.login()
+        self.assertQueryBudget(6, 'post', '/api/token/refresh/', data={'refresh': refresh})
+
+    def test_article_list(self):
+        self.assertConstantQueries(2, 'get', '/api/articles/')
+
+    def test_article_list_served_from_cache(self):
+        self.client.get('/api/articles/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/articles/')
+        self.assertEqual(len(queries), 0, self.describe(queries))
+
+    def test_unknown_query_parameters_share_cache_entries(self):
+        for path in ('/api/articles/article-1/', '/api/articles/'):
+            self.client.get(path)
+            for junk in ('?x=1', '?x=2&utm_source=mail'):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(path + junk)
+                self.assertEqual(len(queries), 0, self.describe(queries))
+        # Parameters the view reads still get their own entry
+        self.assertEqual(self.client.get('/api/articles/article-1/?fields=title').json(), {'title': 'Article 1'})
+        self.assertIn('content', self.client.get('/api/articles/article-1/').json())
+
+    def test_article_search(self):
+        self.assertConstantQueries(3, 'get', '/api/articles/search/?q=lorem')
+
+    def test_article_create(self):
+        self.assertQueryBudget(5, 'post', '/api/articles/', status=201, data={'title': 'Article 1', 'content': 'x'})
+
+    def test_article_detail(self):
+        self.assertQueryBudget(2, 'get', '/api/articles/article-1/')
+
+    def test_article_update(self):
+        self.assertQueryBudget(
+            4, 'put', '/api/articles/article-1/update/', data={'title': 'Renamed'},
+            content_type='application/json', **self.auth(self.staff),
+        )
+
+    def test_article_delete(self):
+        self.assertQueryBudget(4, 'delete', '/api/articles/article-1/delete/', status=204, **self.auth(self.staff))
+
+    def test_course_list(self):
+        self.assertConstantQueries(2, 'get', '/api/course/')
+
+    def test_course_list_is_compact(self):
+        response, queries = self.request('get', '/api/course/')
+        self.assertNotIn('content', response.json()[0])
+        self.assertFalse({'content', 'description'} & selected_columns(queries, 'reapp_course'))
+
+    def test_cart_courses_are_compact(self):
+        response, queries = self.request('get', '/api/cart/', **self.auth(self.user))
+        self.assertNotIn('content', response.json()['cart_items'][0]['course'])
+        sql = next(q['sql'] for q in queries.captured_queries if 'FROM "reapp_cartitem"' in q['sql'])
+        self.assertNotIn('"reapp_course"."content"', sql)
+
+    def test_course_detail(self):
+        self.assertQueryBudget(2, 'get', '/api/course/course-1/')
+
+    def test_conditional_get(self):
+        for path in ('/api/articles/article-1/', '/api/articles/', '/api/course/course-1/', '/api/course/'):
+            etag = self.client.get(path)['ETag']
+            # Only the version lookup runs, the rows are not loaded
+            response = self.assertQueryBudget(1, 'get', path, status=304, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response['ETag'], etag)
+            self.assertNotEqual(self.client.get(path + '?fields=title')['ETag'], etag)
+
+        last_modified = self.client.get('/api/course/course-1/')['Last-Modified']
+        self.assertEqual(self.client.get('/api/course/course-1/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        etag = self.client.get('/api/articles/')['ETag']
+        detail_etag = self.client.get('/api/articles/article-2/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogArticle.objects.get(slug='article-1').delete()
+            article = BlogArticle.objects.get(slug='article-2')
+            article.title = 'Renamed'
+            article.save()
+        self.assertEqual(self.client.get('/api/articles/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get('/api/articles/article-2/', HTTP_IF_NONE_MATCH=detail_etag).status_code, 200)
+
+    def test_course_search(self):
+        self.assertConstantQueries(3, 'get', '/api/course/search/?q=course')
+
+    def test_course_catalog(self):
+        # The version (change feed head), then the courses
+        self.assertConstantQueries(2, 'get', '/api/course/catalog/')
+
+    def test_cart_list(self):
+        self.assertConstantQueries(3, 'get', '/api/cart/', **self.auth(self.user))
+
+    def test_cart_catalog_version_does_not_load_the_catalog(self):
+        response, queries = self.request('get', '/api/cart/', **self.auth(self.user))
+        catalog = [q for q in queries.captured_queries if 'FROM "reapp_course"' in q['sql']]
+        self.assertFalse(catalog, self.describe(queries))
+        version = response.json()['catalog_version']
+        self.assertEqual(self.client.get('/api/course/catalog/')['ETag'], f'"{version}"')
+        self.assertEqual(self.client.get('/api/cart/', **self.auth(self.user)).json()['catalog_version'], version)
+        # The seeded image is not on disk, so no variants are built
+        with mock.patch('reapp.images.schedule'), self.captureOnCommitCallbacks(execute=True):
+            Course.objects.get(slug='course-1').save()
+        self.assertNotEqual(self.client.get('/api/cart/', **self.auth(self.user)).json()['catalog_version'], version)
+
+    def guest_cookie(self, courses):
+        response = HttpResponse()
+        guest_cart.save(None, response, {course.pk: [1, 0] for course in courses})
+        return response.cookies[guest_cart.COOKIE_NAME].output(header='').split(';')[0].strip()
+
+    def test_guest_cart_list(self):
+        # The cart comes from the signed cookie: one query for its courses, one for the catalog version
+        self.assertQueryBudget(2, 'get', '/api/cart/', HTTP_COOKIE=self.guest_cookie(Course.objects.all()))
+        self.seed(self.LARGE - self.SMALL)
+        response = self.assertQueryBudget(
+            2, 'get', '/api/cart/', HTTP_COOKIE=self.guest_cookie(Course.objects.all())
+        )
+        self.assertEqual(len(response.json()['cart_items']), self.LARGE)
+
+    def test_cart_add(self):
+        course = Course.objects.first()
+        self.assertQueryBudget(
+            7, 'post', '/api/cart/', status=201, data={'course_id': course.pk, 'quantity': 1}, **self.auth(self.user)
+        )
+
+    def test_cart_summary(self):
+        response = self.assertConstantQueries(2, 'get', '/api/cart/summary/', **self.auth(self.user))
+        # 2 of each course at 10.00
+        self.assertEqual(response.json(), {'total_items': 2 * self.LARGE, 'grand_total': '%.2f' % (20 * self.LARGE)})
+
+    def test_cart_summary_with_items(self):
+        response = self.assertConstantQueries(3, 'get', '/api/cart/summary/?items=true', **self.auth(self.user))
+        self.assertEqual(len(response.json()['items']), self.LARGE)
+        # Image URLs are absolute, as on every other cart endpoint
+        self.assertTrue(response.json()['items'][0]['course']['image'].startswith('http://testserver/'))
+
+    def test_cart_batch(self):
+        # Same number of queries for 5 and for 50 courses
+        courses = list(Course.objects.all())
+        self.assertQueryBudget(
+            7, 'post', '/api/cart/batch/', content_type='application/json', **self.auth(self.user),
+            data={'items': [{'course_id': course.pk, 'quantity': 1} for course in courses]},
+        )
+        self.seed(self.LARGE - self.SMALL)
+        courses = list(Course.objects.all())
+        response = self.assertQueryBudget(
+            7, 'post', '/api/cart/batch/', content_type='application/json', **self.auth(self.user),
+            data={'items': [{'course_id': course.pk, 'quantity': 1} for course in courses]},
+        )
+        self.assertEqual(len(response.json()['cart_items']), self.LARGE)
+        # 2 seeded + 1 from each batch for the first courses, 2 + 1 for the rest
+        quantities = dict(CartItem.objects.filter(user=self.user).values_list('course_id', 'quantity'))
+        self.assertEqual(quantities[courses[0].pk], 4)
+        self.assertEqual(quantities[courses[-1].pk], 3)
+
+    def test_contact(self):
+        self.assertQueryBudget(3, 'post', '/api/contact/', data={
+            'name': 'Visitor', 'email': 'visitor@example.com', 'message': 'Hello',
+        })
+
+    def test_payment_voucher(self):
+        self.assertQueryBudget(
+            3, 'post', '/api/payment-voucher/', status=201, data={'voucher': image_upload()}, **self.auth(self.user)
+        )
+
+    @mock.patch.dict(os.environ, {'JAZZCASH_INTEGRITY_SALT': 'salt'})
+    def test_jazzcash_payment(self):
+        course = Course.objects.first()
+        self.assertQueryBudget(
+            2, 'post', '/api/jazzcash-payment/', data={'course_id': course.pk, 'quantity': 1}, **self.auth(self.user)
+        )
+
+    def test_password_reset(self):
+        self.assertQueryBudget(2, 'post', '/api/password-reset/', data={
+            'email': 'student@example.com', 'frontend_base_url': 'http://localhost:3000',
+        })
+
+    def test_password_reset_confirm(self):
+        self.assertQueryBudget(2, 'post', '/api/password-reset-confirm/', data={
+            'uid': urlsafe_base64_encode(force_bytes(self.user.pk)),
+            'token': default_token_generator.make_token(self.user),
+            'new_password': 'another-secret',
+        })
+
+
+class LoginThrottleTestCase(ApiTestCase):
+    def test_login_hides_unknown_usernames(self):
+        unknown = self.client.post('/api/login/', {'username': 'nobody', 'password': 'secret-pass'})
+        wrong = self.client.post('/api/login/', {'username': 'student', 'password': 'wrong-pass'})
+        self.assertEqual((unknown.status_code, unknown.json()), (wrong.status_code, wrong.json()))
+
+    def test_failed_logins_throttled_per_username_and_address(self):
+        # login_username allows 5 failed attempts a minute per account and address
+        for _ in range(5):
+            response = self.client.post('/api/login/', {'username': 'student', 'password': 'wrong'})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/login/', {'username': 'student', 'password': 'secret-pass'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+        # Someone else's failures do not lock the owner out
+        response = self.client.post('/api/login/', {'username': 'student', 'password': 'secret-pass'},
+                                    REMOTE_ADDR='10.0.0.99')
+        self.assertEqual(response.status_code, 200)
+
+    @mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'login_username_global': '8/hour'})
+    def test_failed_logins_throttled_per_username_across_addresses(self):
+        # Each address stays under its own 5 a minute, the account is capped at 8 an hour
+        for n in range(8):
+            response = self.client.post('/api/login/', {'username': 'student', 'password': 'wrong'},
+                                        REMOTE_ADDR=f'10.2.0.{n}')
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/login/', {'username': 'student', 'password': 'wrong'},
+                                    REMOTE_ADDR='10.2.1.1')
+        self.assertEqual(response.status_code, 429)
+        # Other accounts are unaffected
+        response = self.client.post('/api/login/', {'username': 'staff', 'password': 'secret-pass'},
+                                    REMOTE_ADDR='10.2.1.1')
+        self.assertEqual(response.status_code, 200)
+
+    def test_successful_logins_are_not_counted(self):
+        for _ in range(6):
+            response = self.client.post('/api/login/', {'username': 'student', 'password': 'secret-pass'})
+            self.assertEqual(response.status_code, 200)
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        # login allows 20 requests a minute per address; a client-supplied
+        # X-Forwarded-For does not give it a new one
+        for n in range(20):
+            self.client.post(
+                '/api/login/', {'username': f'user-{n}', 'password': 'x'}, HTTP_X_FORWARDED_FOR=f'10.1.0.{n}'
+            )
+        response = self.client.post('/api/login/', {'username': 'student', 'password': 'secret-pass'},
+                                    HTTP_X_FORWARDED_FOR='10.1.1.1')
+        self.assertEqual(response.status_code, 429)
+
+
+class TokenRotationTestCase(ApiTestCase):
+    def test_refresh_token_is_single_use(self):
+        refresh = self.login()
+        response = self.client.post('/api/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['refresh'], refresh)
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': refresh}).status_code, 401)
+        # Without the revocation cache the blacklist insert still refuses it
+        self.clear_caches()
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': refresh}).status_code, 401)
+
+    def test_logout_revokes_refresh_token(self):
+        refresh = self.login()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/api/logout/', {'refresh': refresh}).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(len(queries), 0, self.describe(queries))
+
+
+class GuestCartTestCase(ApiTestCase):
+    def test_guest_cart_add_writes_nothing(self):
+        course = make_course('Course', 'course')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/cart/', {'course_id': course.pk, 'quantity': 1})
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse([q for q in queries.captured_queries if not q['sql'].startswith('SELECT')],
+                         self.describe(queries))
+        self.assertIn(guest_cart.COOKIE_NAME, response.cookies)
+
+    def test_guest_cart_merged_at_login(self):
+        course = make_course('Course', 'course')
+        CartItem.objects.create(user=self.user, course=course, quantity=2)
+        self.client.post('/api/cart/', {'course_id': course.pk, 'quantity': 3})
+        response = self.client.post('/api/login/', {'username': 'student', 'password': 'secret-pass'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CartItem.objects.get(user=self.user, course=course).quantity, 5)
+        self.assertEqual(response.cookies[guest_cart.COOKIE_NAME].value, '')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_VARIANTS_ASYNC=False, IMAGE_VARIANT_WIDTHS=(4, 16))
+class CourseImageVariantsTestCase(ApiTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_course_image_variants(self):
+        course = make_course('Course', 'course')
+        course.image = image_upload('cover.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            course.save()
+        srcset = self.client.get(f'/api/course/{course.slug}/').json()['srcset']
+        # The 8px upload is not scaled up to 16px
+        self.assertRegex(srcset['webp'], r'^http://testserver/media/course_images/cover\S*-4w\.webp 4w$')
+        self.assertRegex(srcset['jpeg'], r'-4w\.jpg 4w$')
+
+        # Saving without a new upload does not rebuild them
+        course.refresh_from_db()
+        with self.captureOnCommitCallbacks() as callbacks:
+            course.save()
+        self.assertFalse([callback for callback in callbacks if callback.func is images.schedule])
+
+
+class SparseFieldsetsTestCase(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        make_course('Course 1', 'course-1')
+        BlogArticle.objects.create(title='Article 1', slug='article-1', content='lorem ipsum')
+
+    def test_sparse_fieldsets(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/course/course-1/?fields=title,price')
+        self.assertEqual(response.json(), {'title': 'Course 1', 'price': '10.00'})
+        self.assertEqual(selected_columns(queries, 'reapp_course'), {'id', 'title', 'price'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/articles/article-1/?omit=content')
+        self.assertEqual(response.json(), {'slug': 'article-1', 'title': 'Article 1'})
+        self.assertNotIn('content', selected_columns(queries, 'reapp_blogarticle'))
+
+
+class ArticleSlugTestCase(TestCase):
+    def setUp(self):
+        BlogArticle.objects.create(title='Article 1', content='x')
+
+    def test_conflict_is_retried(self):
+        # A concurrent writer took the slug after it was picked
+        unique_slugs = BlogArticle.objects.unique_slugs
+        with mock.patch.object(
+            BlogArticle.objects, 'unique_slugs', side_effect=[['article-1'], unique_slugs(['article-1'])]
+        ) as picked:
+            article = BlogArticle.objects.create(title='Article 1', content='x')
+        self.assertEqual(picked.call_count, 2)
+        self.assertEqual(article.slug, 'article-1-1')
+
+    def test_other_integrity_errors_are_not_retried(self):
+        with mock.patch.object(BlogArticle.objects, 'unique_slugs', wraps=BlogArticle.objects.unique_slugs) as picked:
+            with self.assertRaises(IntegrityError):
+                BlogArticle.objects.create(title='Untitled', content=None)
+        self.assertEqual(picked.call_count, 1)
+
+
+class UserCacheTestCase(ApiTestCase):
+    def test_authenticated_user_served_from_cache(self):
+        self.client.get('/api/cart/', **self.auth(self.user))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/cart/', **self.auth(self.user))
+        self.assertEqual(response.status_code, 200)
+        user_table = RegisterBlog._meta.db_table
+        self.assertFalse([q for q in queries.captured_queries if user_table in q['sql']], self.describe(queries))
+
+    def test_cached_user_evicted_on_save(self):
+        BlogArticle.objects.create(title='Article', slug='article', content='x')
+        path = '/api/articles/article/update/'
+        self.client.put(path, {'title': 'Renamed'}, content_type='application/json', **self.auth(self.staff))
+        self.staff.is_staff = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.staff.save()
+        response = self.client.put(path, {'title': 'Again'}, content_type='application/json', **self.auth(self.staff))
+        self.assertEqual(response.status_code, 403)
+
+
+class PurgeGuestCartsTestCase(TestCase):
+    def test_removes_old_items_of_expired_sessions_only(self):
+        now = timezone.now()
+        Session.objects.bulk_create([
+            Session(session_key='live', session_data='', expire_date=now + timedelta(days=1)),
+            Session(session_key='expired', session_data='', expire_date=now - timedelta(days=1)),
+        ])
+        courses = Course.objects.bulk_create(
+            Course(
+                title=f'Course {n}', slug=f'course-{n}', description='', author='', level='', duration='',
+                lectures=1, price='10.00', original_price='10.00', discount='', image='course.jpg', content='',
+            )
+            for n in range(2)
+        )
+        items = CartItem.objects.bulk_create([
+            CartItem(session_key=session_key, course=course)
+            for session_key in ('live', 'expired', 'gone') for course in courses
+        ])
+        # Everything is old except the expired session's second item
+        CartItem.objects.exclude(pk=items[3].pk).update(added_at=now - timedelta(days=60))
+
+        call_command('purge_guest_carts', days=30, chunk_size=1, stdout=StringIO())
+
+        self.assertEqual(
+            sorted(CartItem.objects.values_list('session_key', 'course_id')),
+            [('expired', courses[1].pk), ('live', courses[0].pk), ('live', courses[1].pk)],
+        )
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+
+
+def make_course(title, slug, **fields):
+    defaults = dict(
+        description='', author='', level='', duration='', lectures=1, price='10.00', original_price='10.00',
+        discount='', image='', content='',
+    )
+    return Course.objects.create(title=title, slug=slug, **{**defaults, **fields})
+
+
+@override_settings(CART_MAX_QUANTITY=10)
+class CartBatchTestCase(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = make_course('Course', 'course')
+
+    def batch(self, *quantities, **extra):
+        items = [{'course_id': self.course.pk, 'quantity': quantity} for quantity in quantities]
+        return self.client.post('/api/cart/batch/', {'items': items}, content_type='application/json', **extra)
+
+    def test_rejects_unknown_courses(self):
+        response = self.client.post('/api/cart/batch/', {'items': [
+            {'course_id': self.course.pk, 'quantity': 1}, {'course_id': 999999, 'quantity': 1},
+        ]}, content_type='application/json', **self.auth(self.user))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_quantities_are_bounded(self):
+        for extra in (self.auth(self.user), {}):
+            self.assertEqual(self.batch(2 ** 62, **extra).status_code, 400)
+            self.assertEqual(self.batch(2 ** 62, 2 ** 62, **extra).status_code, 400)
+            self.assertEqual(self.batch(6, 5, **extra).status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_totals_stop_at_the_limit(self):
+        for _ in range(3):
+            self.assertEqual(self.batch(4, **self.auth(self.user)).status_code, 200)
+            response = self.batch(4)
+            self.assertEqual(response.status_code, 200)
+            self.client.cookies.update(response.cookies)
+        self.assertEqual(CartItem.objects.get(user=self.user).quantity, 10)
+        self.assertEqual(self.client.get('/api/cart/').json()['cart_items'][0]['quantity'], 10)
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def test_renamed_slug_is_evicted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_course('Course', 'course')
+        etag = self.client.get('/api/course/course/')['ETag']
+        self.assertEqual(self.client.get('/api/course/course/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        course = Course.objects.get(slug='course')
+        course.slug = 'renamed-course'
+        with self.captureOnCommitCallbacks(execute=True):
+            course.save()
+        self.assertEqual(self.client.get('/api/course/course/').status_code, 404)
+        self.assertEqual(self.client.get('/api/course/course/', HTTP_IF_NONE_MATCH=etag).status_code, 404)
+        self.assertEqual(self.client.get('/api/course/renamed-course/').json()['slug'], 'renamed-course')
+
+    def test_stats_count_hits_and_misses(self):
+        make_course('Course', 'course')
+        for path in ('/api/course/course/', '/api/course/course/', '/api/course/', '/api/course/'):
+            self.client.get(path)
+        self.assertEqual(response_cache.stats(), {'hits': 2, 'misses': 2})
+
+        with self.assertRaisesMessage(CommandError, 'not shared between processes'):
+            call_command('response_cache_stats')
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+        with override_settings(CACHES={**settings.CACHES, 'default': shared}):
+            self.client.get('/api/course/course/')
+            self.client.get('/api/course/course/')
+            out = StringIO()
+            call_command('response_cache_stats', '--reset', stdout=out)
+            self.assertEqual(out.getvalue().strip(), 'hits=1 misses=1 hit_ratio=50.00%')
+            self.assertEqual(response_cache.stats(), {'hits': 0, 'misses': 0})
+
+    def test_version_looked_up_before_a_write_is_not_kept(self):
+        def lookup_racing_a_write():
+            # The writer commits between this reader's lookup and its cache set
+            response_cache.invalidate(response_cache.COURSES, 'course')
+            return 'old'
+
+        self.assertEqual(response_cache.detail_version(response_cache.COURSES, 'course', lookup_racing_a_write), 'old')
+        self.assertEqual(response_cache.detail_version(response_cache.COURSES, 'course', lambda: 'new'), 'new')
+
+
+class SearchTestCase(TestCase):
+    def search(self, path, query):
+        response = self.client.get(path, {'q': query})
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        return [result['slug'] for result in response.json()['results']]
+
+    def test_search_fields_match_the_migrated_indexes(self):
+        from reapp.migrations import _search_0009
+        self.assertEqual(search.SEARCH_INDEXES, _search_0009.SEARCH_INDEXES)
+
+    def test_index_follows_writes(self):
+        article = BlogArticle.objects.create(title='Quantum basics', content='x')
+        course = make_course('Quantum course', 'quantum-course')
+        self.assertEqual(self.search('/api/articles/search/', 'quantum'), ['quantum-basics'])
+        self.assertEqual(self.search('/api/course/search/', 'quantum'), ['quantum-course'])
+
+        article.title = 'Relativity basics'
+        article.save()
+        # update() skips signals; only the triggers see it
+        Course.objects.filter(pk=course.pk).update(title='Relativity course')
+        self.assertEqual(self.search('/api/articles/search/', 'quantum'), [])
+        self.assertEqual(self.search('/api/articles/search/', 'relativity'), ['quantum-basics'])
+        self.assertEqual(self.search('/api/course/search/', 'relativity'), ['quantum-course'])
+
+        article.delete()
+        course.delete()
+        self.assertEqual(self.search('/api/articles/search/', 'relativity'), [])
+        self.assertEqual(self.search('/api/course/search/', 'relativity'), [])
+
+    def test_ranking_and_query_syntax(self):
+        BlogArticle.objects.create(title='Notes', content='all about caching layers')
+        BlogArticle.objects.create(title='Caching', content='x')
+        self.assertEqual(self.search('/api/articles/search/', 'caching'), ['caching', 'notes'])
+        # FTS operators in user input are plain text, never syntax errors
+        for query in ('"caching', 'caching*', '-caching', '(caching)', 'caching^', 'cach'):
+            self.assertEqual(self.search('/api/articles/search/', query), ['caching', 'notes'], query)
+        # Operator words are terms too, which every result must contain
+        for query in ('caching OR notes', 'NEAR(caching'):
+            self.assertEqual(self.search('/api/articles/search/', query), [], query)
+        self.assertEqual(self.search('/api/articles/search/', '"*-'), [])
+
+    def test_icontains_fallback(self):
+        BlogArticle.objects.create(title='Notes', content='all about caching layers')
+        BlogArticle.objects.create(title='Caching', content='x')
+        BlogArticle.objects.create(title='Other', content='y')
+        with mock.patch.dict(search.BACKENDS, {}, clear=True):
+            self.assertIsInstance(search.get_backend(), search.IContainsBackend)
+            self.assertEqual(self.search('/api/articles/search/', 'caching'), ['caching', 'notes'])
+            self.assertEqual(self.search('/api/articles/search/', '-caching "layers'), ['notes'])
+            response = self.client.get('/api/articles/search/', {'q': 'caching'})
+            self.assertEqual(response.json()['count'], 2)
+
+
+class SearchTriggersTestCase(TransactionTestCase):
+    # Schema changes need autocommit on SQLite, hence TransactionTestCase
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 triggers are SQLite only')
+
+    def test_triggers_exist_after_all_migrations(self):
+        self.assertEqual(search.missing_sqlite_triggers(connection), [])
+
+    def test_each_migration_keeps_triggers(self):
+        # Steps forward from 0010 on its own, without the post_migrate safety net
+        executor = MigrationExecutor(connection)
+        leaf = executor.loader.graph.leaf_nodes('reapp')[0]
+        later = [key for key in executor.loader.graph.forwards_plan(leaf) if key[0] == 'reapp' and key[1] > '0010']
+        executor.migrate([('reapp', '0010_cartitem_session_added_at_index')])
+        with connection.schema_editor() as schema_editor:
+            search.restore_sqlite_triggers(schema_editor)
+        for target in later:
+            MigrationExecutor(connection).migrate([target])
+            self.assertEqual(search.missing_sqlite_triggers(connection), [], target[1])
+
+    def test_post_migrate_restores_dropped_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER reapp_course_fts_ai')
+        make_course('Orphaned', 'orphaned')
+        self.assertEqual(search.missing_sqlite_triggers(connection), ['reapp_course'])
+        signals.restore_search_triggers(sender=apps.get_app_config('reapp'), using='default')
+        self.assertEqual(search.missing_sqlite_triggers(connection), [])
+        # The rebuild also picks up rows written while the trigger was gone
+        response = self.client.get('/api/course/search/', {'q': 'orphaned'})
+        self.assertEqual([result['slug'] for result in response.json()['results']], ['orphaned'])
+
+
+class FailingSendBackend(BaseEmailBackend):
+    def send_messages(self, messages):
+        raise OSError('421 try again later')
+
+
+class UnreachableBackend(BaseEmailBackend):
+    def open(self):
+        raise ConnectionRefusedError('connection refused')
+
+    def send_messages(self, messages):
+        self.open()
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+    EMAIL_OUTBOX_BACKOFF_SECONDS=60,
+)
+class OutboxTestCase(TestCase):
+    def enqueue(self, subject='Hello'):
+        return outbox.enqueue(subject, 'Body', ['user@example.com'], from_email='noreply@example.com')
+
+    def make_due(self):
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+
+    def test_sends_queued_mail(self):
+        email = self.enqueue()
+        self.assertEqual(outbox.drain(), (1, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.SENT, 1))
+        self.assertEqual([message.subject for message in mail.outbox], ['Hello'])
+        self.assertEqual(outbox.drain(), (0, 0))
+
+    def test_failures_back_off_then_dead_letter(self):
+        email = self.enqueue()
+        before = timezone.now()
+        self.assertEqual(outbox.drain(connection=FailingSendBackend()), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.PENDING, 1))
+        self.assertIn('421', email.last_error)
+        self.assertGreaterEqual(email.next_attempt_at, before + timedelta(seconds=60))
+        # Not due again until the backoff has passed
+        self.assertEqual(outbox.drain(), (0, 0))
+
+        self.make_due()
+        self.assertEqual(outbox.drain(connection=FailingSendBackend()), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.DEAD, 2))
+        self.make_due()
+        self.assertEqual(outbox.drain(), (0, 0))
+
+    def test_retry_after_failure(self):
+        email = self.enqueue()
+        outbox.drain(connection=FailingSendBackend())
+        self.make_due()
+        self.assertEqual(outbox.drain(), (1, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.SENT, 2))
+
+    def test_unreachable_server_fails_every_row_without_crashing(self):
+        first, second = self.enqueue('First'), self.enqueue('Second')
+        with override_settings(EMAIL_BACKEND='reapp.tests.UnreachableBackend'):
+            call_command('send_outbox_emails', once=True, stdout=StringIO())
+        for email in (first, second):
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (OutboundEmail.PENDING, 1))
+            self.assertIn('refused', email.last_error)
+
+
+class ORJSONRendererTestCase(TestCase):
+    def test_matches_json_renderer(self):
+        user = RegisterBlog.objects.create_user('a@example.com', 'a', 'secret-pass', First_name='A', Last_name='B')
+        course = Course.objects.create(
+            title='Café\u2028course\u2029', slug='cafe', description='ünïcode 😀 "quoted"\n', author='', level='',
+            duration='', lectures=1, price='10.50', original_price='19.99', discount='', image='c.jpg', content='',
+        )
+        CartItem.objects.create(user=user, course=course, quantity=3)
+        request = Request(APIRequestFactory().get('/api/cart/'))
+        cart = CartItemSerializer(CartItem.objects.all(), many=True, context={'request': request}).data
+        data = {
+            'cart': cart,
+            'prices': [Decimal('10.50'), Decimal('0.1')],
+            'at': timezone.now(),
+            'detail': _('Not found.'),
+            'ids': {1: uuid.uuid4()},
+        }
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            ORJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'),
+        )
+
+    def test_parser_matches_json_parser(self):
+        for body in (b'{"items":[{"course":1,"quantity":2}],"note":"\\u00e9 \\ud800"}', b'{"a":', b'NaN'):
+            try:
+                expected = JSONParser().parse(BytesIO(body))
+            except ParseError as exc:
+                with self.assertRaisesMessage(ParseError, str(exc.detail)):
+                    ORJSONParser().parse(BytesIO(body))
+            else:
+                self.assertEqual(ORJSONParser().parse(BytesIO(body)), expected)
+
+
+class CompressionTestCase(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        Course.objects.bulk_create(
+            Course(
+                title=f'Course {n}', slug=f'course-{n}', description='Learn things', author='Author',
+                level='Beginner', duration='3h', lectures=10, price='10.00', original_price='20.00',
+                discount='50%', image='course_images/course.jpg', content='content ' * 500,
+            )
+            for n in range(20)
+        )
+
+    def test_gzip_is_compressed_once(self):
+        plain = self.client.get('/api/course/')
+        with mock.patch('reapp.compression.compress_chunks', wraps=compression.compress_chunks) as compress:
+            first = self.client.get('/api/course/', HTTP_ACCEPT_ENCODING='br;q=0, gzip, deflate')
+            second = self.client.get('/api/course/', HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(compress.call_count, 1)
+        for response in (first, second):
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertIn('Accept-Encoding', response['Vary'])
+            self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertNotIn('Content-Encoding', self.client.get('/api/course/', HTTP_ACCEPT_ENCODING='gzip;q=0'))
+
+    def test_small_and_uncached_paths_are_left_alone(self):
+        response = self.client.get('/api/course/course-1/?fields=title', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        response = self.client.get('/api/cart/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+
+    @override_settings(COMPRESSION_STREAM_MIN_SIZE=1024)
+    def test_large_bodies_are_streamed_then_cached(self):
+        plain = self.client.get('/api/course/catalog/').content
+        response = self.client.get('/api/course/catalog/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+        response = self.client.get('/api/course/catalog/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.streaming)
+        self.assertEqual(gzip.decompress(response.content), plain)
+
+
+@override_settings(SLOW_REQUEST_THRESHOLD_MS=None)
+class RequestTimingTestCase(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        BlogArticle.objects.create(title='Article', slug='article', content='lorem ipsum')
+
+    def timings(self, response):
+        return {entry.split(';')[0]: entry for entry in response['Server-Timing'].split(', ')}
+
+    def test_server_timing_phases(self):
+        timings = self.timings(self.client.get('/api/changes/'))
+        self.assertEqual(set(timings), {'db', 'view', 'render', 'total'})
+        self.assertRegex(timings['db'], r'^db;dur=[\d.]+;desc="\d+ queries"$')
+
+    def test_prebuilt_responses_have_no_render_phase(self):
+        # The response cache serializes inside the view; 0 would be a lie
+        for _ in range(2):
+            timings = self.timings(self.client.get('/api/articles/article/'))
+            self.assertEqual(set(timings), {'db', 'view', 'total'})
+
+    def test_quiet_by_default(self):
+        with self.assertNoLogs('reapp.timing', level='INFO'):
+            self.client.get('/api/changes/')
+        with self.assertLogs('reapp.timing', level='DEBUG') as logs:
+            self.client.get('/api/articles/article/')
+        self.assertEqual(logs.records[0].levelname, 'DEBUG')
+        self.assertIn('"render_ms": null', logs.output[0])
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_requests_warn_with_sql(self):
+        with self.assertLogs('reapp.timing', level='WARNING') as logs:
+            self.client.get('/api/articles/article/')
+        self.assertIn('reapp_blogarticle', logs.output[0])
+
+
+class ArticleExportImportTestCase(TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'articles.ndjson')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.path))
+
+    def export(self, chunk_size):
+        call_command('export_articles', output=self.path, chunk_size=chunk_size, stderr=StringIO())
+        with open(self.path, encoding='utf-8') as f:
+            return f.read().splitlines()
+
+    def load(self, lines, chunk_size):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        out, err = StringIO(), StringIO()
+        call_command('import_articles', input=self.path, chunk_size=chunk_size, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_round_trip(self):
+        for n in range(5):
+            BlogArticle.objects.create(title=f'Article {n}', slug=f'kept-{n}', content=f'Body {n} ünïcode')
+        lines = self.export(chunk_size=2)
+        self.assertEqual([json.loads(line)['slug'] for line in lines], [f'kept-{n}' for n in range(5)])
+
+        BlogArticle.objects.all().delete()
+        BlogArticle.objects.create(title='Squatter', slug='kept-1', content='x')
+        # Invalid lines between valid ones, and a slug the previous chunk already used
+        lines[2:2] = ['not json', '[1, 2]', '{"title": "", "content": "x"}']
+        lines.append(json.dumps({'slug': 'kept-0', 'title': 'Article 0 again', 'content': 'y'}))
+        out, err = self.load(lines, chunk_size=2)
+
+        self.assertIn('Imported 6 articles (3 rejected)', out)
+        self.assertEqual([line.split(':')[0] for line in err.splitlines()], ['line 3', 'line 4', 'line 5'])
+        self.assertEqual(
+            dict(BlogArticle.objects.values_list('title', 'slug')),
+            {
+                'Squatter': 'kept-1', 'Article 0': 'kept-0', 'Article 1': 'article-1', 'Article 2': 'kept-2',
+                'Article 3': 'kept-3', 'Article 4': 'kept-4', 'Article 0 again': 'article-0-again',
+            },
+        )
+        self.assertEqual(BlogArticle.objects.get(slug='kept-4').content, 'Body 4 ünïcode')
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class ChangeFeedTestCase(TestCase):
+    def setUp(self):
+        # Users cached by an earlier test would authenticate under the same ids
+        for cache in caches.all():
+            cache.clear()
+
+    def changes(self, since, limit=100):
+        # The entries, then at most one query per object type
+        with CaptureQueriesContext(connection) as queries:
+            page = self.client.get(f'/api/changes/?since={since}&limit={limit}').json()
+        self.assertLessEqual(len(queries), 3)
+        return page, [(change['type'], change['slug'], change['action']) for change in page['changes']]
+
+    def test_changes_since_cursor(self):
+        staff = RegisterBlog.objects.create_user('staff@example.com', 'staff', 'secret-pass', is_staff=True)
+        first = BlogArticle.objects.create(title='First', content='x')
+        BlogArticle.objects.create(title='Second', content='y')
+        Course.objects.create(
+            title='Course', slug='course', description='', author='', level='', duration='',
+            lectures=1, price='10.00', original_price='10.00', discount='', image='course.jpg', content='',
+        )
+        first.title = 'First, edited'
+        first.save()
+        token = RefreshToken.for_user(staff).access_token
+        response = self.client.delete('/api/articles/second/delete/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 204)
+
+        page, changes = self.changes(0, limit=3)
+        # The second article is already gone, so its creation reads as a deletion
+        self.assertEqual(changes, [('article', 'first', 'created'), ('article', 'second', 'deleted'),
+                                   ('course', 'course', 'created')])
+        self.assertEqual(page['changes'][0]['data']['title'], 'First, edited')
+        self.assertEqual(page['changes'][2]['data']['price'], '10.00')
+        self.assertTrue(page['has_more'])
+
+        page, changes = self.changes(page['next'])
+        self.assertEqual(changes, [('article', 'first', 'updated'), ('article', 'second', 'deleted')])
+        self.assertIsNone(page['changes'][1]['data'])
+        self.assertFalse(page['has_more'])
+
+        self.assertEqual(self.changes(page['next'])[1], [])
+        with override_settings(CHANGE_FEED_SETTLE_SECONDS=60):
+            self.assertEqual(self.client.get('/api/changes/').json()['changes'], [])
+        self.assertEqual(self.client.get('/api/changes/?since=x').status_code, 400)
+
+    def test_cursor_stops_at_unsettled_entry(self):
+        # Ids are handed out in insert order but a slow transaction commits
+        # later: its older id must not be skipped when a newer one settles
+        first = BlogArticle.objects.create(title='First', content='x')
+        second = BlogArticle.objects.create(title='Second', content='y')
+        now = timezone.now()
+        ChangeLogEntry.objects.filter(object_id=first.pk).update(changed_at=now + timedelta(seconds=5))
+        ChangeLogEntry.objects.filter(object_id=second.pk).update(changed_at=now - timedelta(seconds=5))
+
+        page, changes = self.changes(0)
+        self.assertEqual(changes, [])
+        self.assertEqual(page['next'], 0)
+
+        ChangeLogEntry.objects.filter(object_id=first.pk).update(changed_at=now - timedelta(seconds=1))
+        page, changes = self.changes(page['next'])
+        self.assertEqual(changes, [('article', 'first', 'created'), ('article', 'second', 'created')])
+
+    def test_bulk_imports_are_recorded(self):
+        source = os.path.join(tempfile.mkdtemp(), 'articles.ndjson')
+        with open(source, 'w') as f:
+            f.write('{"title": "Imported", "content": "x"}\n{"title": "Imported", "content": "y"}\n')
+        call_command('import_articles', input=source, stdout=StringIO())
+        shutil.rmtree(os.path.dirname(source))
+        self.assertEqual(self.changes(0)[1], [('article', 'imported', 'created'), ('article', 'imported-1', 'created')])
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class StaticExportTestCase(TestCase):
+    def export(self, **options):
+        stdout = StringIO()
+        call_command('export_static', output=self.output, page_size=2, stdout=stdout, **options)
+        return re.match(r'Wrote (\d+) files and removed (\d+)', stdout.getvalue()).groups()
+
+    def read(self, path):
+        with open(os.path.join(self.output, path), 'rb') as f:
+            return ORJSONParser().parse(BytesIO(f.read()))
+
+    def exists(self, path):
+        return os.path.exists(os.path.join(self.output, path))
+
+    def slugs(self, path):
+        return [item['slug'] for item in self.read(path)['results']]
+
+    def test_incremental_export(self):
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+        # With page_size=2, page-1 lists ids 1-2, page-2 ids 3-4 and so on
+        first, second, third = [
+            BlogArticle.objects.create(id=pk, title=title, content='x') for pk, title in ((1, 'A'), (2, 'B'), (3, 'C'))
+        ]
+        make_course('Course', 'course')
+        # Three details, two article pages, a course detail and page, the manifest
+        self.assertEqual(self.export(), ('8', '0'))
+        self.assertEqual(self.read('articles/a.json')['title'], 'A')
+        # Newest first, as the API lists them
+        self.assertEqual(self.slugs('articles/page-2.json'), ['c'])
+        self.assertEqual(self.read('articles/page-2.json')['next'], 'articles/page-1.json')
+        self.assertEqual(self.slugs('articles/page-1.json'), ['b', 'a'])
+        self.assertEqual(self.read('courses/course.json')['price'], '10.00')
+        manifest = self.read('manifest.json')['sections']['articles']
+        self.assertEqual(manifest['count'], 3)
+        self.assertEqual([page['path'] for page in manifest['pages']], ['articles/page-2.json', 'articles/page-1.json'])
+        self.assertEqual(self.export(), ('0', '0'))
+
+        # The detail, the page listing it and the manifest
+        first.title = 'A, edited'
+        first.save()
+        self.assertEqual(self.export(), ('3', '0'))
+        self.assertEqual(self.read('articles/a.json')['title'], 'A, edited')
+
+        # A renamed slug takes its old file with it
+        second.slug = 'b-renamed'
+        second.save()
+        self.assertEqual(self.export(), ('3', '1'))
+        self.assertFalse(self.exists('articles/b.json'))
+        self.assertEqual(self.slugs('articles/page-1.json'), ['b-renamed', 'a'])
+
+        # New objects only touch the newest page, and its neighbour's link
+        # when they open a new one
+        BlogArticle.objects.create(id=4, title='D', content='x')
+        self.assertEqual(self.export(), ('3', '0'))
+        BlogArticle.objects.create(id=5, title='E', content='x')
+        self.assertEqual(self.export(), ('4', '0'))
+        self.assertEqual(self.read('articles/page-2.json')['previous'], 'articles/page-3.json')
+
+        # Emptying a page removes it and relinks its neighbours
+        third.delete()
+        BlogArticle.objects.filter(slug='d').delete()
+        self.assertEqual(self.export(), ('3', '3'))
+        self.assertFalse(self.exists('articles/c.json') or self.exists('articles/page-2.json'))
+        self.assertEqual(self.read('articles/page-3.json')['next'], 'articles/page-1.json')
+        self.assertEqual(self.read('articles/page-1.json')['previous'], 'articles/page-3.json')
+        self.assertEqual(self.read('manifest.json')['sections']['articles']['count'], 3)
+
+        self.assertEqual(self.export(full=True), ('0', '0'))
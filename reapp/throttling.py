@@ -0,0 +1,135 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import caches
+from django.utils.crypto import get_random_string
+from rest_framework.exceptions import Throttled
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import ScopedRateThrottle
+
+
+class ScopedIPRateThrottle(ScopedRateThrottle):
+    # DRF's sliding window (a list of request timestamps per key), kept in
+    # THROTTLE_CACHE_ALIAS so every worker shares the same counters. Only
+    # writes are counted; reads on the same viewsets stay unthrottled.
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE_ALIAS]
+
+    def get_rate(self):
+        # Read at request time rather than import time so rates can be changed per environment and in tests
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS:
+            return True
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class ScopedUsernameRateThrottle(ScopedIPRateThrottle):
+    # Counts attempts against one account across all client addresses, using
+    # the `<throttle_scope>_username` rate
+    def allow_request(self, request, view):
+        self.field = getattr(view, 'throttle_username_field', 'username')
+        return super().allow_request(request, view)
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(f'{self.scope}_username')
+
+    def username_ident(self, request):
+        value = request.data.get(self.field) if hasattr(request.data, 'get') else None
+        if not value or not isinstance(value, str):
+            return None
+        return hashlib.md5(value.strip().lower().encode()).hexdigest()
+
+    def get_cache_key(self, request, view):
+        ident = self.username_ident(request)
+        if ident is None:
+            return None
+        return self.cache_format % {'scope': f'{self.scope}_username', 'ident': ident}
+
+
+class FailedLoginRateThrottle(ScopedUsernameRateThrottle):
+    # Only failed attempts count, and per account and client address: a
+    # stranger guessing passwords cannot lock the owner out, and the owner's
+    # correct password is never refused for someone else's mistakes. The
+    # view reports failures with record_failure().
+    def allow_request(self, request, view):
+        request._failed_login_throttles = [*getattr(request, '_failed_login_throttles', []), self]
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        ident = self.username_ident(request)
+        if ident is None:
+            return None
+        return self.cache_format % {'scope': f'{self.scope}_failed', 'ident': f'{ident}:{self.get_ident(request)}'}
+
+    def throttle_success(self):
+        return True
+
+    def record_failure(self):
+        history = [stamp for stamp in self.cache.get(self.key, []) if stamp > self.timer() - self.duration]
+        history.insert(0, self.timer())
+        self.cache.set(self.key, history, self.duration)
+
+
+class AccountFailedLoginRateThrottle(FailedLoginRateThrottle):
+    # Failed attempts against one account from all addresses together, at
+    # the higher `<throttle_scope>_username_global` rate, so guessing from
+    # rotating addresses is bounded as well
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(f'{self.scope}_username_global')
+
+    def get_cache_key(self, request, view):
+        ident = self.username_ident(request)
+        if ident is None:
+            return None
+        return self.cache_format % {'scope': f'{self.scope}_failed_global', 'ident': ident}
+
+
+def record_failure(request):
+    for throttle in getattr(request, '_failed_login_throttles', []):
+        if getattr(throttle, 'key', None) is not None:
+            throttle.record_failure()
+
+
+_hash_slots = None
+_hash_slots_lock = threading.Lock()
+_dummy_hash = None
+
+
+def hash_slots():
+    global _hash_slots
+    if _hash_slots is None:
+        with _hash_slots_lock:
+            if _hash_slots is None:
+                _hash_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_CONCURRENCY)
+    return _hash_slots
+
+
+def verify_password(password, encoded):
+    # At most PASSWORD_HASH_CONCURRENCY hashes run at once in this worker, so
+    # a login flood queues here instead of taking every CPU from other
+    # requests. encoded=None (unknown user) hashes against a dummy so the
+    # response time does not reveal whether the account exists.
+    global _dummy_hash
+    slots = hash_slots()
+    if not slots.acquire(timeout=settings.PASSWORD_HASH_WAIT_SECONDS):
+        raise Throttled(wait=settings.PASSWORD_HASH_WAIT_SECONDS)
+    try:
+        if encoded is None:
+            if _dummy_hash is None:
+                _dummy_hash = make_password(get_random_string(32))
+            check_password(password, _dummy_hash)
+            return False
+        return check_password(password, encoded)
+    finally:
+        slots.release()
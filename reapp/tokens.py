@@ -0,0 +1,58 @@
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+
+def get_cache():
+    return caches[settings.TOKEN_REVOCATION_CACHE_ALIAS]
+
+
+def revoked_key(jti):
+    return f'jwt:revoked:{jti}'
+
+
+def remember_revoked(jti, exp):
+    # Only needed until the token would have expired anyway
+    timeout = int(exp - time.time())
+    if timeout > 0:
+        get_cache().set(revoked_key(jti), True, timeout)
+
+
+class RotatingRefreshToken(RefreshToken):
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        # Replays of revoked tokens are turned away by the cache without a query
+        if get_cache().get(revoked_key(jti)):
+            raise TokenError(_("Token is blacklisted"))
+        # With rotation every refresh blacklists the token it used, and the
+        # insert in blacklist() fails for a token that is already there, so
+        # the blacklist read is only needed when rotation is off
+        if not (api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION):
+            super().check_blacklist()
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        exp = self.payload['exp']
+        with transaction.atomic():
+            token, _created = OutstandingToken.objects.get_or_create(
+                jti=jti, defaults={'token': str(self), 'expires_at': datetime_from_epoch(exp)},
+            )
+            try:
+                with transaction.atomic():
+                    blacklisted = BlacklistedToken.objects.create(token=token)
+            except IntegrityError:
+                # Already used or logged out; this also stops two concurrent
+                # refreshes with the same token from both succeeding
+                remember_revoked(jti, exp)
+                raise TokenError(_("Token is blacklisted"))
+            transaction.on_commit(partial(remember_revoked, jti, exp))
+        return blacklisted
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
-from .views import BlogArticleDetailView, UpdateBlogArticleView, RegistrationViewSet, LoginViewSet, ContactUsViewSet, CourseViewSet, CartItemViewSet, JazzCashPaymentView, PasswordResetRequestView, PasswordResetConfirmView, PaymentViewSet
+from .views import BlogArticleDetailView, UpdateBlogArticleView, RegistrationViewSet, LoginViewSet, ContactUsViewSet, CourseViewSet, CartItemViewSet, JazzCashPaymentView, PasswordResetRequestView, PasswordResetConfirmView, PaymentViewSet, TokenRefreshView, LogoutView
 from django.conf.urls.static import static
 from django.conf import settings
 
@@ -14,7 +14,11 @@ router.register(r'cart', CartItemViewSet, basename='cart')
 router.register(r'payment-voucher', PaymentViewSet, basename='payment')
 urlpatterns = [
     path('', include(router.urls)),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('logout/', LogoutView.as_view(), name='logout'),
+    path('changes/', views.list_changes, name='list_changes'),
     path('articles/', views.create_blog_article, name='create_blog_article'),
+    path('articles/search/', views.search_blog_articles, name='search_blog_articles'),  # Must precede the slug route
     path('articles/<slug:slug>/update/', UpdateBlogArticleView.as_view(), name='UpdateBlogArticleView'),
     path('articles/<slug:slug>/', views.get_blog_article_by_id, name='get_blog_article_by_id'),  # This is for GET
     path('articles/<slug:slug>/delete/', BlogArticleDetailView.as_view(), name='delete_blog_article'),  # This is for DELETE
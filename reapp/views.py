@@ -1,23 +1,32 @@
 import os
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import EmailMultiAlternatives
-from email.mime.image import MIMEImage
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from rest_framework import viewsets, status, mixins
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.contrib.auth.hashers import check_password
-from .serializers import RegisterSerializers, LoginSerializers, BlogArticleSerializer, BlogContactUsSerializer, CourseSerializer, CartItemSerializer, PaymentSerializer
+from .serializers import RegisterSerializers, LoginSerializers, TokenRefreshSerializer, LogoutSerializer, CartBatchSerializer, CartSummarySerializer, BlogArticleSerializer, BlogArticleListSerializer, BlogContactUsSerializer, CourseSerializer, CourseCardSerializer, CartItemSerializer, PaymentSerializer
 from .models import RegisterBlog, BlogArticle, BlogContactUs, Course, CartItem, PaymentVoucher
+from .pagination import ArticleCursorPagination, SearchPagination
+from .search import SearchResults
+from .throttling import AccountFailedLoginRateThrottle, FailedLoginRateThrottle, ScopedIPRateThrottle, ScopedUsernameRateThrottle, record_failure, verify_password
+from . import changes, guest_cart, outbox, response_cache
+from .authentication import CachedJWTAuthentication
+from .conditional import article_list_version, article_version, conditional, course_list_version, course_version
+from .tokens import RotatingRefreshToken
 from rest_framework.decorators import api_view, action
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import BasePermission, IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.core.mail import send_mail
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt import views as jwt_views
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
 from django.db import IntegrityError
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+from decimal import Decimal
 from datetime import datetime, timedelta
 import hmac, hashlib
 
@@ -27,6 +36,8 @@ User = get_user_model()
 class RegistrationViewSet(viewsets.ModelViewSet):
     queryset = RegisterBlog.objects.all()
     serializer_class = RegisterSerializers
+    throttle_classes = [ScopedIPRateThrottle]
+    throttle_scope = 'register'
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -38,43 +49,66 @@ class RegistrationViewSet(viewsets.ModelViewSet):
 
 class LoginViewSet(viewsets.ViewSet):
     serializer_class = LoginSerializers
+    throttle_classes = [ScopedIPRateThrottle, FailedLoginRateThrottle, AccountFailedLoginRateThrottle]
+    throttle_scope = 'login'
 
     def create(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             username = serializer.validated_data['username']
             password = serializer.validated_data['password']
-            try:
-                # Retrieve user based on username
-                user = RegisterBlog.objects.get(name=username)
-
-                # Check if password is correct
-                if check_password(password, user.password):
-                    # Generate JWT token for the user
-                    refresh = RefreshToken.for_user(user)
-                    access_token = refresh.access_token
-
-                    # Prepare user information to return in the response
-                    user_info = {
-                        'is_superuser': user.is_superuser,
-                        'is_staff': user.is_staff,
-                        'is_active': user.is_active
-                    }
-
-                    # Return success message with JWT token and user info
-                    return Response({
-                        'message': 'Login successful',
-                        'access_token': str(access_token),
-                        'user_info': user_info
-                    }, status=status.HTTP_200_OK)
-                else:
-                    return Response({'error': 'Invalid password'}, status=status.HTTP_400_BAD_REQUEST)
-            except RegisterBlog.DoesNotExist:
-                return Response({'error': 'Username does not exist'}, status=status.HTTP_400_BAD_REQUEST)
+            user = RegisterBlog.objects.filter(name=username).first()
+
+            # Unknown users and wrong passwords get the same answer after the same amount of hashing
+            if verify_password(password, user.password if user else None):
+                # Generate JWT token for the user
+                refresh = RotatingRefreshToken.for_user(user)
+                access_token = refresh.access_token
+
+                # Prepare user information to return in the response
+                user_info = {
+                    'is_superuser': user.is_superuser,
+                    'is_staff': user.is_staff,
+                    'is_active': user.is_active
+                }
+
+                # Return success message with JWT token and user info
+                response = Response({
+                    'message': 'Login successful',
+                    'access_token': str(access_token),
+                    'refresh_token': str(refresh),
+                    'user_info': user_info
+                }, status=status.HTTP_200_OK)
+                # Whatever was added to the cart before logging in is kept
+                guest_cart.merge(request, response, user)
+                return response
+            record_failure(request)
+            return Response({'error': 'Invalid username or password'}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class TokenRefreshView(jwt_views.TokenRefreshView):
+    # Returns a new access token and, as ROTATE_REFRESH_TOKENS is on, a new
+    # refresh token; the one sent in is blacklisted
+    serializer_class = TokenRefreshSerializer
+
+
+class LogoutView(APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def post(self, request):
+        serializer = LogoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            RotatingRefreshToken(serializer.validated_data['refresh']).blacklist()
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        return Response({'message': 'Logged out successfully'}, status=status.HTTP_200_OK)
+
+
 @api_view(['GET', 'POST'])
+@conditional(article_list_version)
 def create_blog_article(request):
     if request.method == 'POST':
         serializer = BlogArticleSerializer(data=request.data)
@@ -89,19 +123,55 @@ def create_blog_article(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     if request.method == 'GET':
-        articles = BlogArticle.objects.all()
-        serializer = BlogArticleSerializer(articles, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        cached = response_cache.for_list(response_cache.ARTICLES, request)
+        body = cached.get()
+        if body is None:
+            paginator = ArticleCursorPagination()
+            articles = paginator.paginate_queryset(BlogArticle.objects.for_listing(), request)
+            serializer = BlogArticleListSerializer(articles, many=True, context={'request': request})
+            body = cached.set(paginator.get_paginated_response(serializer.data).data)
+        return response_cache.json_response(body)
 
 
 @api_view(['GET'])
-def get_blog_article_by_id(request, slug):
+def search_blog_articles(request):
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'Query parameter q is required'}, status=status.HTTP_400_BAD_REQUEST)
+    paginator = SearchPagination()
+    articles = paginator.paginate_queryset(SearchResults(BlogArticle.objects.for_listing(), query), request)
+    serializer = BlogArticleListSerializer(articles, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+def list_changes(request):
+    # Articles and courses created, updated or deleted after ?since=<sequence>,
+    # oldest first; clients pass the returned `next` back until has_more is false
     try:
-        article = BlogArticle.objects.get(slug=slug)
-        serializer = BlogArticleSerializer(article)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    except BlogArticle.DoesNotExist:
-        return Response({'error': 'Article not found'}, status=status.HTTP_404_NOT_FOUND)
+        since = int(request.query_params.get('since', 0))
+        limit = int(request.query_params.get('limit', settings.CHANGE_FEED_PAGE_SIZE))
+    except ValueError:
+        return Response({'error': 'since and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if since < 0 or limit < 1:
+        return Response({'error': 'since must be >= 0 and limit >= 1'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(changes.page(request, since, min(limit, settings.CHANGE_FEED_MAX_PAGE_SIZE)))
+
+
+@api_view(['GET'])
+@conditional(article_version)
+def get_blog_article_by_id(request, slug):
+    cached = response_cache.for_detail(response_cache.ARTICLES, slug, request)
+    body = cached.get()
+    if body is None:
+        serializer = BlogArticleSerializer(context={'request': request})
+        try:
+            article = BlogArticle.objects.only(*serializer.get_only_fields()).get(slug=slug)
+        except BlogArticle.DoesNotExist:
+            return Response({'error': 'Article not found'}, status=status.HTTP_404_NOT_FOUND)
+        serializer.instance = article
+        body = cached.set(serializer.data)
+    return response_cache.json_response(body)
 
 
 class IsSuperUserOrStaff(BasePermission):
@@ -112,7 +182,7 @@ class IsSuperUserOrStaff(BasePermission):
 # In your view
 class UpdateBlogArticleView(APIView):
     permission_classes = [IsSuperUserOrStaff]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     def put(self, request, slug):
         try:
@@ -141,6 +211,8 @@ class BlogArticleDetailView(APIView):
 class ContactUsViewSet(viewsets.ModelViewSet):
     queryset = BlogContactUs.objects.all()
     serializer_class = BlogContactUsSerializer
+    throttle_classes = [ScopedIPRateThrottle]
+    throttle_scope = 'contact'
 
     def create(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -152,105 +224,241 @@ class ContactUsViewSet(viewsets.ModelViewSet):
             # Save the message to database
             serializer.save()
 
-            try:
-                # Send email to YOUR email address (admin email)
-                send_mail(
-                    f"New message from {name} ({email})",  # Subject
-                    f"From: {name} <{email}>\n\n{message}",  # Message body
-                    settings.DEFAULT_FROM_EMAIL,  # From email (your server email)
-                    [settings.ADMIN_EMAIL],  # To email (YOUR email)
-                    fail_silently=False,
-                )
-
-                # Optional: Send confirmation to the user
-                send_mail(
-                    "Thank you for contacting us",
-                    f"Dear {name},\n\nWe have received your message and will get back to you soon.\n\nYour message:\n{message}",
-                    settings.DEFAULT_FROM_EMAIL,
-                    [email],  # Send to user's email
-                    fail_silently=True,
-                )
-
-                return Response({'message': 'Your message has been sent successfully!'},
-                                status=status.HTTP_200_OK)
-            except Exception as e:
-                return Response({'error': str(e)},
-                                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            # Mail goes out through the outbox worker (manage.py send_outbox_emails)
+            outbox.enqueue(
+                f"New message from {name} ({email})",  # Subject
+                f"From: {name} <{email}>\n\n{message}",  # Message body
+                [settings.ADMIN_EMAIL],  # To email (YOUR email)
+            )
+
+            # Optional: Send confirmation to the user
+            outbox.enqueue(
+                "Thank you for contacting us",
+                f"Dear {name},\n\nWe have received your message and will get back to you soon.\n\nYour message:\n{message}",
+                [email],  # Send to user's email
+            )
+
+            return Response({'message': 'Your message has been sent successfully!'},
+                            status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@method_decorator(conditional(course_list_version), name='list')
+@method_decorator(conditional(course_version), name='retrieve')
 class CourseViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     lookup_field = 'slug'
 
+    def get_serializer_class(self):
+        # Lists are compact cards unless the client picks its own ?fields=
+        if self.action in ('list', 'search') and 'fields' not in self.request.query_params:
+            return CourseCardSerializer
+        return CourseSerializer
+
+    def get_queryset(self):
+        return Course.objects.only(*self.get_serializer().get_only_fields())
+
+    def list(self, request, *args, **kwargs):
+        cached = response_cache.for_list(response_cache.COURSES, request)
+        body = cached.get()
+        if body is None:
+            body = cached.set(super().list(request, *args, **kwargs).data)
+        return response_cache.json_response(body)
+
+    def retrieve(self, request, *args, **kwargs):
+        cached = response_cache.for_detail(response_cache.COURSES, kwargs[self.lookup_field], request)
+        body = cached.get()
+        if body is None:
+            body = cached.set(super().retrieve(request, *args, **kwargs).data)
+        return response_cache.json_response(body)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Query parameter q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        paginator = SearchPagination()
+        courses = paginator.paginate_queryset(SearchResults(self.get_queryset(), query), request)
+        serializer = self.get_serializer(courses, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def catalog(self, request):
+        version, body = catalog_snapshot(request)
+        etag = f'"{version}"'
+        response = get_conditional_response(request, etag=etag) or response_cache.json_response(body)
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=settings.CATALOG_MAX_AGE)
+        return response
+
+
+def catalog_snapshot(request):
+    return response_cache.catalog_snapshot(
+        request,
+        course_list_version(request)[0],
+        # The snapshot is shared by every caller, so ?fields= on the request must not change it
+        lambda: CourseSerializer(
+            Course.objects.all(), many=True, context={'request': request, 'sparse_fieldsets': False}
+        ).data,
+    )
+
 
 class CartItemViewSet(viewsets.ModelViewSet):
     serializer_class = CartItemSerializer
     queryset = CartItem.objects.all()
 
+    def uses_guest_storage(self):
+        # Anonymous carts live in a signed cookie or the cache and only reach the DB at login
+        return not self.request.user.is_authenticated and not guest_cart.uses_database()
+
     def get_queryset(self):
+        return CartItem.objects.filter(**self.cart_owner()).select_related('course').only(
+            *self.get_serializer().get_only_fields()
+        )
+
+    def cart_owner(self):
         if self.request.user.is_authenticated:
-            return CartItem.objects.filter(user=self.request.user).select_related('course')
+            return {'user': self.request.user}
         if not self.request.session.session_key:
             self.request.session.create()
-        return CartItem.objects.filter(session_key=self.request.session.session_key).select_related('course')
+        return {'session_key': self.request.session.session_key}
+
+    def get_guest_item(self, items):
+        try:
+            course_id = int(self.kwargs['pk'])
+        except ValueError:
+            raise NotFound()
+        course = Course.objects.filter(pk=course_id).first() if course_id in items else None
+        if course is None:
+            raise NotFound()
+        return course
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        course_id = request.data.get('course_id')
-        quantity = int(request.data.get('quantity', 1))
+        # The serializer has already checked that the course exists
+        course = serializer.validated_data['course']
+        quantity = serializer.validated_data.get('quantity', 1)
+
+        if self.uses_guest_storage():
+            items = guest_cart.load(request)
+            if course.pk not in items and len(items) >= settings.GUEST_CART_MAX_ITEMS:
+                return Response({"error": "Cart is full"}, status=status.HTTP_400_BAD_REQUEST)
+            guest_cart.add(items, course.pk, quantity)
+            response = Response(
+                self.get_serializer(guest_cart.item(course, *items[course.pk])).data,
+                status=status.HTTP_201_CREATED
+            )
+            guest_cart.save(request, response, items)
+            return response
 
-        try:
-            course = Course.objects.get(pk=course_id)
+        # Incremented in the database, so concurrent adds are not lost
+        cart_item = CartItem.objects.add_quantities({course.pk: quantity}, **self.cart_owner()).get()
+        cart_item.course = course
 
-            if request.user.is_authenticated:
-                cart_item, created = CartItem.objects.get_or_create(
-                    user=request.user,
-                    course=course,
-                    defaults={'quantity': quantity}
-                )
-                if not created:
-                    cart_item.quantity += quantity
-                    cart_item.save()
-            else:
-                if not request.session.session_key:
-                    request.session.create()
-                cart_item, created = CartItem.objects.get_or_create(
-                    session_key=request.session.session_key,
-                    course=course,
-                    defaults={'quantity': quantity}
-                )
-                if not created:
-                    cart_item.quantity += quantity
-                    cart_item.save()
-
-            # Return the created/updated cart item
-            serializer = self.get_serializer(cart_item)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        # Return the created/updated cart item
+        serializer = self.get_serializer(cart_item)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        except Course.DoesNotExist:
-            return Response(
-                {"error": "Course does not exist"},
-                status=status.HTTP_400_BAD_REQUEST
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        quantities = serializer.validated_data['items']
+
+        if self.uses_guest_storage():
+            items = guest_cart.load(request)
+            if len(set(items) | set(quantities)) > settings.GUEST_CART_MAX_ITEMS:
+                return Response({"error": "Cart is full"}, status=status.HTTP_400_BAD_REQUEST)
+            for course_id, quantity in quantities.items():
+                guest_cart.add(items, course_id, quantity)
+            cart_items = guest_cart.build_items({course_id: items[course_id] for course_id in quantities})
+            response = Response({'cart_items': self.get_serializer(cart_items, many=True).data})
+            guest_cart.save(request, response, items)
+            return response
+
+        cart_items = CartItem.objects.add_quantities(quantities, **self.cart_owner()).select_related('course')
+        return Response({'cart_items': self.get_serializer(cart_items, many=True).data})
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        # Totals for the header badge and checkout preview, computed by the
+        # database; ?items=true adds the line items
+        if self.uses_guest_storage():
+            items = guest_cart.load(request)
+            prices = dict(Course.objects.filter(pk__in=items).values_list('pk', 'price')) if items else {}
+            summary = {
+                'total_items': sum(items[course_id][0] for course_id in prices),
+                'grand_total': sum((items[course_id][0] * price for course_id, price in prices.items()), Decimal(0)),
+            }
+        else:
+            summary = CartItem.objects.filter(**self.cart_owner()).aggregate(
+                total_items=Coalesce(Sum('quantity'), 0),
+                grand_total=Coalesce(
+                    Sum(F('quantity') * F('course__price'), output_field=DecimalField(max_digits=10, decimal_places=2)),
+                    Decimal(0),
+                ),
             )
+        if request.query_params.get('items') in ('1', 'true'):
+            if self.uses_guest_storage():
+                summary['items'] = guest_cart.build_items(items)
+            else:
+                summary['items'] = self.get_queryset()
+        return Response(CartSummarySerializer(summary, context=self.get_serializer_context()).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.uses_guest_storage():
+            return super().retrieve(request, *args, **kwargs)
+        items = guest_cart.load(request)
+        course = self.get_guest_item(items)
+        return Response(self.get_serializer(guest_cart.item(course, *items[course.pk])).data)
+
+    def update(self, request, *args, **kwargs):
+        if not self.uses_guest_storage():
+            return super().update(request, *args, **kwargs)
+        items = guest_cart.load(request)
+        course = self.get_guest_item(items)
+        serializer = self.get_serializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        items[course.pk][0] = serializer.validated_data.get('quantity', items[course.pk][0])
+        response = Response(self.get_serializer(guest_cart.item(course, *items[course.pk])).data)
+        guest_cart.save(request, response, items)
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        if not self.uses_guest_storage():
+            return super().destroy(request, *args, **kwargs)
+        items = guest_cart.load(request)
+        course = self.get_guest_item(items)
+        del items[course.pk]
+        response = Response(status=status.HTTP_204_NO_CONTENT)
+        guest_cart.save(request, response, items)
+        return response
 
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
+        if self.uses_guest_storage():
+            queryset = guest_cart.build_items(guest_cart.load(request))
+        else:
+            queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
 
-        courses = Course.objects.all()
-        course_serializer = CourseSerializer(courses, many=True)
+        # Clients refetch /api/course/catalog/ only when this version changes.
+        # It comes from the course list version, so the catalog is not built here.
+        catalog_version = response_cache.catalog_version(request, course_list_version(request)[0])
 
         return Response({
             'cart_items': serializer.data,
-            'available_courses': course_serializer.data
+            'catalog_version': catalog_version
         })
 
 class PasswordResetRequestView(APIView):
+    throttle_classes = [ScopedIPRateThrottle, ScopedUsernameRateThrottle]
+    throttle_scope = 'password_reset'
+    throttle_username_field = 'email'
+
     def post(self, request):
         email = request.data.get("email")
         if not email:
@@ -266,18 +474,19 @@ class PasswordResetRequestView(APIView):
 
         reset_link = f"{request.data.get('frontend_base_url')}/reset-password/{uid}/{token}/"
 
-        send_mail(
+        outbox.enqueue(
             subject="Reset your password",
-            message=f"Click here to reset your password: {reset_link}",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.Email],
-            fail_silently=False,
+            body=f"Click here to reset your password: {reset_link}",
+            to=[user.Email],
         )
 
         return Response({"message": "Password reset link sent!"})
 
 
 class PasswordResetConfirmView(APIView):
+    throttle_classes = [ScopedIPRateThrottle]
+    throttle_scope = 'password_reset'
+
     def post(self, request):
         uidb64 = request.data.get("uid")
         token = request.data.get("token")
@@ -303,7 +512,7 @@ class PasswordResetConfirmView(APIView):
 class PaymentViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
     serializer_class = PaymentSerializer
     queryset = PaymentVoucher.objects.all()
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def create(self, request, *args, **kwargs):
@@ -315,32 +524,21 @@ class PaymentViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
 
         user = request.user  # Assuming the user is authenticated
         user_name = user.name
-        print(user_name)
 
-
-        # Email setup
-        subject = "New Voucher Uploaded"
-        from_email = settings.DEFAULT_FROM_EMAIL
-        to = [settings.ADMIN_EMAIL]  # Replace with your admin/accountant email
-
-        text_content = "A student has submitted a new payment voucher."
         html_content = f"""
                 <p>A student {user_name} has submitted a new payment voucher.</p>
                 <p><strong>Voucher Image:</strong></p>
                 <img src="cid:voucher_image" alt="Voucher" style="max-width: 600px; border: 1px solid #ccc;" />
                 """
-        email = EmailMultiAlternatives(subject, text_content, from_email, to)
-        email.attach_alternative(html_content, "text/html")
-
-        # Attach image inline using CID
-        if instance.voucher:
-            with open(instance.voucher.path, 'rb') as img_file:
-                image = MIMEImage(img_file.read())
-                image.add_header('Content-ID', '<voucher_image>')
-                image.add_header("Content-Disposition", "inline", filename=instance.voucher.name)
-                email.attach(image)
-
-        email.send(fail_silently=False)
+        # The voucher is attached inline by the outbox worker when the mail is sent
+        outbox.enqueue(
+            "New Voucher Uploaded",
+            "A student has submitted a new payment voucher.",
+            [settings.ADMIN_EMAIL],  # Replace with your admin/accountant email
+            html_body=html_content,
+            inline_image=instance.voucher.name if instance.voucher else '',
+            inline_image_cid='voucher_image',
+        )
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 